@@ -4,6 +4,8 @@
 # output to be used as a ground truth for training tesseract
 
 from datetime import datetime
+import json
+import os
 import pathlib
 import random
 import re
@@ -14,11 +16,19 @@ OVERWRITE_FILES: "bool" = True
 
 training_text_file = "amh-layer.training_txt"
 
+# to process a shard of training text written by `combine-all-txts.py` (with
+# NO_OF_SHARDS set), instead of all lines. If `shard_no` is `None`, the first
+# shard not yet claimed (by other renderers) is claimed.
+use_shards = False
+shards_index_file = "amh-layer.training_txt.shards.json"
+shard_no = None
+
 output_directory = "./amh-layer-ground-truth"
 
 log_dir = "./log"
 
-# start index and no of lines to process from txt file
+# start index and no of lines to process from txt file (all lines of a
+# claimed shard are processed)
 start_index = 0		# page no. minus one
 count = 5000		# set to -1 for all lines after start_index
 
@@ -74,6 +84,33 @@ def setup_output_dir(OVERWRITE: bool, output_dir_path: pathlib.Path):
                 print(f'Overwriting files in "{output_dir_path}"')
 
 
+def claim_shard(index_file: str, shard_no: "int | None"):
+    """Returns no. and path of shard claimed by creating a `.claimed` file
+    next to it. If `shard_no` is `None` claims first unclaimed shard."""
+    with open(index_file) as f:
+        index = json.load(f)
+    shards_dir = pathlib.Path(index_file).parent
+
+    shard_nos = range(index["no_of_shards"]) if shard_no is None else [shard_no]
+    for i in shard_nos:
+        shard_path = shards_dir.joinpath(index["shards"][i]["file"])
+        try:
+            # fails if file exists (claimed), even if created concurrently
+            os.close(os.open(f"{shard_path}.claimed", os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            continue
+        return i, shard_path
+
+    print(f'No unclaimed shard in "{index_file}"')
+    exit(1)
+
+
+if use_shards:
+    shard_no, training_text_file = claim_shard(shards_index_file, shard_no)
+    # to not mix up output of shards
+    output_directory = f"{output_directory}-shard-{shard_no}"
+    print(f'Claimed shard {shard_no}: "{training_text_file}"')
+
 # setup output and log directory
 output_dir_path = pathlib.Path(output_directory)
 log_dir_path = pathlib.Path(log_dir)
@@ -88,13 +125,18 @@ with open(training_text_file, "r") as input_file:
     for line in input_file:
         lines.append(line.strip())
 rand = random.Random(23)
-rand.shuffle(lines)
 
-# use only 'count' no. of lines
-if count > 0:
-    lines = lines[start_index : start_index + count]
+if use_shards:
+    # use all lines of shard (already shuffled & sized by combine-all-txts.py)
+    start_index = 0
 else:
-    lines = lines[start_index : ]
+    rand.shuffle(lines)
+
+    # use only 'count' no. of lines
+    if count > 0:
+        lines = lines[start_index : start_index + count]
+    else:
+        lines = lines[start_index : ]
 
 
 # map of each font to its font name, with space replaced with `_` and
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Adds quotes & punctuations to random words of training text (augmentation),
+used by `combine-all-txts.py`.
+
+Only words of Ethiopic letters are augmented. Eligible words are found once
+(vectorised over code points), and each augmentation is added to exactly the
+requested no. of distinct eligible words, chosen with a seeded generator.
+"""
+
+from itertools import islice
+from typing import Iterable
+
+import numpy as np
+
+from constants import eth_unicode_range_letters
+
+# no. of words checked at a time
+batch_size = 1 << 20
+
+
+def get_eligible_mask(words: "Iterable[str]"):
+    """Returns boolean array, True for words of Ethiopic letters only."""
+    masks: "list[np.ndarray]" = []
+    words = iter(words)
+    while True:
+        batch = list(islice(words, batch_size))
+        if not batch:
+            break
+
+        code_points = np.frombuffer("".join(batch).encode("utf-32-le"), np.uint32)
+        is_bad = (code_points < eth_unicode_range_letters.start) | (
+            code_points >= eth_unicode_range_letters.stop
+        )
+        # no. of non letter chars in each word
+        bad_counts = np.concatenate([[0], np.cumsum(is_bad)])
+        word_lens = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        ends = np.cumsum(word_lens)
+        masks.append(bad_counts[ends] == bad_counts[ends - word_lens])
+
+    return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+
+
+def choose_edits(
+    eligible: np.ndarray,
+    augmentations: "list[tuple[str, str, int]]",
+    rand: np.random.Generator,
+):
+    """
+    Returns sorted indices of words to augment, and index of augmentation
+    (`(prefix, suffix, no. of words)`) of each. Words are distinct, so each
+    augmentation is added to exactly its no. of words. If there are fewer
+    eligible words than needed, no. of words of all augmentations are scaled
+    down (by the same factor) to fit.
+    """
+    eligible_indices = np.flatnonzero(eligible)
+    counts = np.array([k for _, _, k in augmentations], dtype=np.int64)
+    if counts.sum() > len(eligible_indices):
+        print(
+            f"WARNING: {counts.sum()} words to augment, only "
+            f"{len(eligible_indices)} eligible. Augmenting fewer words."
+        )
+        counts = counts * len(eligible_indices) // counts.sum()
+
+    indices = eligible_indices[
+        rand.choice(len(eligible_indices), size=counts.sum(), replace=False)
+    ]
+    edit_ids = np.repeat(np.arange(len(augmentations)), counts)
+    order = np.argsort(indices)
+
+    return indices[order], edit_ids[order]
+
+
+def apply_edits(
+    words: "Iterable[str]",
+    indices: np.ndarray,
+    edit_ids: np.ndarray,
+    augmentations: "list[tuple[str, str, int]]",
+):
+    """Yields words, with prefix & suffix of augmentation added to chosen words."""
+    edits = iter(zip(indices.tolist(), edit_ids.tolist()))
+    next_index, edit_id = next(edits, (-1, 0))
+    for i, w in enumerate(words):
+        if i == next_index:
+            prefix, suffix, _ = augmentations[edit_id]
+            w = prefix + w + suffix
+            next_index, edit_id = next(edits, (-1, 0))
+        yield w
+
+
+def augment(
+    words: "Iterable[str]",
+    augmentations: "list[tuple[str, str, int]]",
+    seed: int,
+):
+    """
+    Returns iterator of words with augmentations (`(prefix, suffix, no. of
+    words)`) added to random eligible words. Words are iterated twice (to find
+    eligible words & to augment them), so must be the same each time.
+    """
+    indices, edit_ids = choose_edits(
+        get_eligible_mask(words), augmentations, np.random.default_rng(seed)
+    )
+
+    return apply_edits(words, indices, edit_ids, augmentations)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmarks cleaning functions in utils.py on a synthetic Ethiopic corpus,
+and checks that optimised (candidate) versions give byte for byte the same
+output as the reference functions.
+
+Results (lines/sec of each function & equivalence) are saved as JSON, and
+compared with results of a previous run to spot regressions.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+from constants import (
+    enclosure_end_list,
+    enclosure_start_list,
+    eth_puncs,
+    eth_unicode_range_letters,
+    lines_to_skip,
+    strip_chars_ptrn,
+)
+from utils import (
+    LineCleaner,
+    clean_line,
+    clean_non_frequent,
+    clean_strt_and_end,
+    convert_to_eth_num,
+    convert_to_eth_nums,
+    remove_junk_in_enclosures,
+)
+
+# no. of synthetic lines & numbers to benchmark on, and seed to generate them
+no_of_lines = 100000
+no_of_nums = 100000
+seed = 23
+
+# real txt files added to synthetic corpus (e.g. a few training_texts files)
+corpus_file_paths: "list[str]" = []
+
+# no. of times to run each function (fastest run is reported)
+no_of_repeats = 3
+
+results_dir = "./benchmark_results"
+# results of a previous run to compare with (`None` to skip)
+compare_to_file_path = None
+
+# chars used to generate junk (mostly non Ethiopic chars removed by cleaning)
+junk_chars = list("~$^#\\_•…−–—`{};@&") + list("abcdefxyzABCé")
+# Ethiopic accent marks & less frequent chars that are removed or replaced
+non_frequent_chars = ["፝", "፞", "፟", "ጕ", "ኵ", "ዅ", "ኍ", "፧", "፠", "፨", "ቍ", "ጘ"]
+# proportions of word kinds in a line
+word_kinds = {
+    "plain": 70,
+    "with_punc": 12,
+    "enclosed": 5,
+    "number": 4,
+    "junk": 4,
+    "junk_enclosed": 2,
+    "repetitive_punc": 1,
+    "non_frequent": 2,
+}
+
+
+def generate_word(rand: random.Random):
+    """Returns a random word of a kind chosen by `word_kinds` proportions."""
+    word = "".join(
+        chr(rand.choice(eth_unicode_range_letters)) for _ in range(rand.randint(1, 7))
+    )
+    kind = rand.choices(list(word_kinds), weights=list(word_kinds.values()))[0]
+
+    if kind == "with_punc":
+        return word + rand.choice(sorted(eth_puncs) + ["፡፡", "፡-", ".", ",", "?", "!"])
+    if kind == "enclosed":
+        i = rand.randrange(len(enclosure_start_list))
+        return enclosure_start_list[i] + word + enclosure_end_list[i]
+    if kind == "number":
+        n = rand.randint(0, 3000)
+        return str(n) if rand.random() < 0.5 else convert_to_eth_num(n)
+    if kind == "junk":
+        return "".join(rand.choice(junk_chars) for _ in range(rand.randint(1, 6)))
+    if kind == "junk_enclosed":
+        i = rand.randrange(len(enclosure_start_list))
+        junk = "".join(rand.choice(junk_chars[:12]) for _ in range(rand.randint(0, 3)))
+        return word + " " + enclosure_start_list[i] + junk + enclosure_end_list[i]
+    if kind == "repetitive_punc":
+        return word + rand.choice([".", "_", "…"]) * rand.randint(2, 12)
+    if kind == "non_frequent":
+        i = rand.randrange(len(word) + 1)
+        return word[:i] + rand.choice(non_frequent_chars) + word[i:]
+
+    return word
+
+
+def generate_corpus(no_of_lines: int, seed: int):
+    """
+    Returns list of random lines (with newline at end) containing
+    Ethiopic words mixed with punctuations, enclosures and junk.
+    """
+    rand = random.Random(seed)
+    lines: "list[str]" = []
+    for _ in range(no_of_lines):
+        p = rand.random()
+        if p < 0.02:  # empty and space lines
+            line = rand.choice(["", " ", "\t"])
+        elif p < 0.03:  # lines to be skipped
+            line = rand.choice(sorted(lines_to_skip))
+        else:
+            words = [generate_word(rand) for _ in range(rand.randint(1, 18))]
+            # table & list remnants at start and end of line
+            if rand.random() < 0.05:
+                words.insert(0, rand.choice(["|", "-", "*", "1.", "..."]) * 3)
+            if rand.random() < 0.05:
+                words.append(rand.choice(["|", "_", "-", ")"]) * 3)
+            line = " ".join(words)
+        lines.append(line + "\n")
+
+    return lines
+
+
+def read_corpus_files(file_paths: "list[str]"):
+    """Returns all lines in given files."""
+    lines: "list[str]" = []
+    for file_path in file_paths:
+        with open(file_path) as txt_file:
+            lines.extend(txt_file.readlines())
+
+    return lines
+
+
+def as_text(output: "str|list[str]"):
+    """Returns function output as string (list of words are joined)."""
+    return output if isinstance(output, str) else " ".join(output)
+
+
+def run_benchmark(func, inputs: list, is_batch: bool = False):
+    """
+    Runs `func` over all inputs `no_of_repeats` times. If `is_batch`
+    is set, `func` is called once with all inputs.
+
+    Returns: inputs processed per second (of fastest run) & outputs.
+    """
+    best_time = float("inf")
+    outputs: list = []
+    for _ in range(no_of_repeats):
+        start = time.perf_counter()
+        outputs = list(func(inputs)) if is_batch else [func(x) for x in inputs]
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return len(inputs) / best_time, outputs
+
+
+def compare_outputs(ref_outputs: list, cand_outputs: list, inputs: list):
+    """Returns equivalence info of candidate & reference outputs."""
+    ref_texts = [as_text(out) for out in ref_outputs]
+    cand_texts = [as_text(out) for out in cand_outputs]
+    mismatches = [
+        i for i, (ref, cand) in enumerate(zip(ref_texts, cand_texts)) if ref != cand
+    ]
+
+    return {
+        "identical": not mismatches,
+        "no_of_mismatches": len(mismatches),
+        "reference_sha256": hashlib.sha256("\n".join(ref_texts).encode()).hexdigest(),
+        "candidate_sha256": hashlib.sha256("\n".join(cand_texts).encode()).hexdigest(),
+        "mismatch_examples": [
+            {"input": inputs[i], "reference": ref_texts[i], "candidate": cand_texts[i]}
+            for i in mismatches[:5]
+        ],
+    }
+
+
+def get_benchmarks():
+    """
+    Returns dict of benchmark name to `(input kind, reference function,
+    candidate function)`. Candidate is `None` if there is no optimised one,
+    and is called once with all inputs if its name ends with `_batch`.
+    """
+    line_cleaner = LineCleaner()
+    strip_pattern = (
+        r"(^" + strip_chars_ptrn + r"{3,}.?|.?" + strip_chars_ptrn + r"{3,}$)"
+    )
+
+    return {
+        "clean_non_frequent": (
+            "raw_lines",
+            clean_non_frequent,
+            line_cleaner.clean_non_frequent,
+        ),
+        "clean_line": ("allowed_lines", clean_line, line_cleaner.clean_line),
+        "remove_junk_in_enclosures": (
+            "allowed_lines",
+            remove_junk_in_enclosures,
+            line_cleaner.remove_junk_in_enclosures,
+        ),
+        "clean_strt_and_end": (
+            "allowed_lines",
+            lambda line: re.sub(strip_pattern, clean_strt_and_end, line),
+            lambda line: line_cleaner.strip_ptrn.sub(clean_strt_and_end, line),
+        ),
+        "convert_to_eth_num_batch": (
+            "numbers",
+            convert_to_eth_num,
+            lambda nums: convert_to_eth_nums(nums).tolist(),
+        ),
+    }
+
+
+def print_results(results: dict, old_results: "dict|None"):
+    """Prints throughput of each function (& change from old results)."""
+    print(f"{'function':<28}{'reference':>14}{'candidate':>14}{'speedup':>9}  same")
+    for name, result in results["benchmarks"].items():
+        ref, cand = result["reference_per_sec"], result.get("candidate_per_sec")
+        row = f"{name:<28}{ref:>14,.0f}"
+        if cand is not None:
+            row += f"{cand:>14,.0f}{cand / ref:>8.2f}x  {result['identical']}"
+        print(row)
+
+        # compare with previous run
+        if old_results and name in old_results["benchmarks"]:
+            old_result = old_results["benchmarks"][name]
+            for key in ["reference_per_sec", "candidate_per_sec"]:
+                if result.get(key) and old_result.get(key):
+                    change = result[key] / old_result[key] - 1
+                    print(f"    {key} vs previous run: {change:+.1%}")
+
+
+if __name__ == "__main__":
+    raw_lines = generate_corpus(no_of_lines, seed) + read_corpus_files(
+        corpus_file_paths
+    )
+    inputs_dict = {
+        "raw_lines": raw_lines,
+        # input of clean_line is output of clean_non_frequent
+        "allowed_lines": [clean_non_frequent(line) for line in raw_lines],
+        "numbers": random.Random(seed).choices(range(100000000), k=no_of_nums),
+    }
+
+    results = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "no_of_lines": len(raw_lines),
+        "no_of_nums": no_of_nums,
+        "seed": seed,
+        "benchmarks": {},
+    }
+    for name, (input_kind, ref_func, cand_func) in get_benchmarks().items():
+        inputs = inputs_dict[input_kind]
+        ref_per_sec, ref_outputs = run_benchmark(ref_func, inputs)
+        result = {"reference_per_sec": round(ref_per_sec, 1)}
+
+        if cand_func is not None:
+            cand_per_sec, cand_outputs = run_benchmark(
+                cand_func, inputs, name.endswith("_batch")
+            )
+            result["candidate_per_sec"] = round(cand_per_sec, 1)
+            result.update(compare_outputs(ref_outputs, cand_outputs, inputs))
+
+        results["benchmarks"][name] = result
+
+    old_results = None
+    if compare_to_file_path is not None:
+        with open(compare_to_file_path) as results_file:
+            old_results = json.load(results_file)
+
+    print_results(results, old_results)
+
+    # save results
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    t = datetime.now().strftime("%b-%d-%H_%M_%S")
+    results_file_path = os.path.join(results_dir, f"cleaning-{t}.json")
+    with open(results_file_path, "w") as results_file:
+        json.dump(results, results_file, indent=2, ensure_ascii=False)
+    print(f'Results saved to: "{results_file_path}"')
+
+    # exit with error if a candidate output differs from reference
+    if not all(r.get("identical", True) for r in results["benchmarks"].values()):
+        exit(1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Counts chars, words & lines of UTF-8 txt files without decoding them into
+strings, used by `generate_txts_info.py`.
+
+Each file is memory mapped as bytes and read in chunks (ending at a newline).
+Chars are non continuation bytes, whose code points are decoded (vectorised)
+from the 1-4 bytes of each char. Words start at non whitespace chars after
+whitespace (the same whitespace as `str.split`), and lines end at newline
+bytes (`\\r` alone is not counted as a line break).
+"""
+
+import os
+from glob import iglob
+
+import numpy as np
+
+# root dir of txt files to print stats of (when run as a script)
+txts_root_dir = "./cleaned_texts/"
+
+# no. of bytes of a file read at a time (a chunk ends at a newline)
+chunk_size = 16 * 1024 * 1024
+
+# code points of whitespace chars (as used by `str.split`, all below 0x3001),
+# and lookup table of code points (larger ones looked up as 0x3001)
+whitespace_code_points = np.array(
+    [c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32
+)
+is_whitespace_table = np.zeros(0x3002, dtype=bool)
+is_whitespace_table[whitespace_code_points] = True
+
+# mask of code point bits in lead byte, by no. of bytes of char
+lead_byte_masks = np.array([0, 0x7F, 0x1F, 0x0F, 0x07], dtype=np.uint8)
+
+# Ethiopic block (3 byte chars in UTF-8)
+ethiopic_range = range(0x1200, 0x1380)
+
+
+def decode_code_points(buf: np.ndarray):
+    """Returns code point of each char of UTF-8 bytes (uint8 array)."""
+    lead_pos = np.flatnonzero((buf & 0xC0) != 0x80)
+    b0 = buf[lead_pos]
+    # no. of bytes of each char (from its lead byte)
+    char_lens = 1 + (b0 >= 0xC0) + (b0 >= 0xE0) + (b0 >= 0xF0)
+
+    # bits of code point in lead byte, then 6 bits of each continuation byte
+    code_points = (b0 & lead_byte_masks[char_lens]).astype(np.uint32)
+    padded = np.concatenate([buf, np.zeros(3, dtype=np.uint8)])
+    for k in range(1, 4):
+        cont = padded[lead_pos + k] & 0x3F
+        code_points = np.where(char_lens > k, (code_points << 6) | cont, code_points)
+
+    return code_points
+
+
+def add_counts(total: np.ndarray, counts: np.ndarray):
+    """Returns sum of two bincounts of possibly d/t lengths."""
+    if len(counts) > len(total):
+        total, counts = counts, total
+    total = total.copy()
+    total[: len(counts)] += counts
+
+    return total
+
+
+def iter_chunks(file_path: str):
+    """Yields chunks of bytes (uint8 arrays) of file, each ending at a newline."""
+    try:
+        data = np.memmap(file_path, dtype=np.uint8, mode="r")
+    except ValueError:  # empty file can't be mapped
+        return
+
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_size, len(data))
+        # extend chunk to end of its last line
+        while end < len(data):
+            newlines = np.flatnonzero(data[start:end] == 10)
+            if len(newlines):
+                end = start + int(newlines[-1]) + 1
+                break
+            end = min(end + chunk_size, len(data))
+        yield np.asarray(data[start:end])
+        start = end
+
+
+def get_byte_stats(file_path: str):
+    """
+    Returns no. of lines, chars, words & length of words (non whitespace
+    chars), bincount of code points of chars, and bincount of line lengths
+    (words of line joined by a space) of file.
+    """
+    no_of_lines, no_of_chars, no_of_wrds, len_of_wrds = 0, 0, 0, 0
+    code_point_counts = np.zeros(0, dtype=np.int64)
+    line_len_counts = np.zeros(0, dtype=np.int64)
+
+    for buf in iter_chunks(file_path):
+        code_points = decode_code_points(buf)
+        is_newline = code_points == 10
+        is_word_char = ~is_whitespace_table[np.minimum(code_points, 0x3001)]
+        # word chars after whitespace (or at start of chunk, a line start)
+        is_word_start = is_word_char & np.concatenate([[True], ~is_word_char[:-1]])
+
+        # line of each char (a newline belongs to the line it ends)
+        line_ids = np.cumsum(is_newline) - is_newline
+        chunk_lines = int(is_newline.sum()) + (not is_newline[-1])
+        chars_per_line = np.bincount(line_ids[is_word_char], minlength=chunk_lines)
+        wrds_per_line = np.bincount(line_ids[is_word_start], minlength=chunk_lines)
+        line_lens = np.where(wrds_per_line > 0, chars_per_line + wrds_per_line - 1, 0)
+
+        no_of_lines += chunk_lines
+        no_of_chars += len(code_points)
+        no_of_wrds += int(is_word_start.sum())
+        len_of_wrds += int(is_word_char.sum())
+        code_point_counts = add_counts(code_point_counts, np.bincount(code_points))
+        line_len_counts = add_counts(line_len_counts, np.bincount(line_lens))
+
+    return {
+        "no_of_lines": no_of_lines,
+        "no_of_chars": no_of_chars,
+        "no_of_wrds": no_of_wrds,
+        "len_of_wrds": len_of_wrds,
+        "code_point_counts": code_point_counts,
+        "line_len_counts": line_len_counts,
+    }
+
+
+def get_ethiopic_counts(code_point_counts: np.ndarray):
+    """Returns counts of each code point of Ethiopic block (zero padded)."""
+    counts = np.zeros(len(ethiopic_range), dtype=np.int64)
+    found = code_point_counts[ethiopic_range.start : ethiopic_range.stop]
+    counts[: len(found)] = found
+
+    return counts
+
+
+if __name__ == "__main__":
+    # print stats of all txt files in root dir
+    no_of_lines, no_of_chars, no_of_wrds = 0, 0, 0
+    code_point_counts = np.zeros(0, dtype=np.int64)
+    pathname = os.path.join(txts_root_dir, "**", "*.txt")
+    for file_path in iglob(pathname, recursive=True):
+        stats = get_byte_stats(file_path)
+        no_of_lines += stats["no_of_lines"]
+        no_of_chars += stats["no_of_chars"]
+        no_of_wrds += stats["no_of_wrds"]
+        code_point_counts = add_counts(code_point_counts, stats["code_point_counts"])
+
+    ethiopic_counts = get_ethiopic_counts(code_point_counts)
+    print(f"{no_of_lines} lines, {no_of_chars} chars, {no_of_wrds} words")
+    print(
+        f"{int(ethiopic_counts.sum())} Ethiopic chars "
+        f"({np.count_nonzero(ethiopic_counts)} of {len(ethiopic_range)} code points)"
+    )
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Plans the chars to inject into training text so that each char of a
+unicharset has at least a target no. of samples, used by `combine-all-txts.py`.
+
+Chars are counted (as bincounts of code points) in the words of the training
+text before injection. Only chars below their target are injected, each the
+no. of times it lacks, so targets are met with the fewest injected chars.
+"""
+
+from typing import Iterable
+
+import numpy as np
+
+from byte_stats import add_counts
+from unicharset import Unicharset, special_unichars
+
+
+def get_words_code_point_counts(words: "Iterable[str]"):
+    """Returns bincount of code points of chars of words."""
+    code_points = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+
+    return np.bincount(code_points)
+
+
+def get_augmentation_counts(augmentations: "list[tuple[str, str, int]]"):
+    """
+    Returns bincount of code points of chars added by augmentations
+    (`(prefix, suffix, no. of words)`, see augment.py).
+    """
+    counts = np.zeros(0, dtype=np.int64)
+    for prefix, suffix, k in augmentations:
+        counts = add_counts(counts, k * get_words_code_point_counts([prefix, suffix]))
+
+    return counts
+
+
+def get_char_targets(
+    unicharset: Unicharset,
+    min_count: int,
+    targets: "dict[str, int]",
+    skip_chars: "Iterable[str]" = (),
+):
+    """
+    Returns target no. of samples of each (single char) unichar of unicharset:
+    `min_count`, or given target if larger. Space & skipped chars have no target.
+    """
+    skip_chars = {" "} | special_unichars | set(skip_chars)
+    char_targets = {
+        u: min_count for u in unicharset.unichars if len(u) == 1 and u not in skip_chars
+    }
+    for ch, target in targets.items():
+        char_targets[ch] = max(target, char_targets.get(ch, 0))
+
+    return char_targets
+
+
+def plan_injections(code_point_counts: np.ndarray, char_targets: "dict[str, int]"):
+    """
+    Returns `{char: no. to inject}` of chars with fewer samples than their
+    target (most lacking first).
+    """
+    injections: "dict[str, int]" = {}
+    for ch, target in char_targets.items():
+        c = ord(ch)
+        count = int(code_point_counts[c]) if c < len(code_point_counts) else 0
+        if count < target:
+            injections[ch] = target - count
+
+    return dict(sorted(injections.items(), key=lambda x: x[1], reverse=True))
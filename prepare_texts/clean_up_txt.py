@@ -2,23 +2,82 @@
 """
 Cleans txt files by removing undesired non Ethiopic characters,
 fixing spacing b/n words and unwanted character repetitions.
+
+Set `no_of_workers` to clean files in parallel using a process pool.
+
+With `incremental` set, only input files that changed since last run are
+cleaned. A manifest of cleaned inputs (size, mtime & hash) and of the
+cleaning rules is kept in output root dir. All files are cleaned again
+when the rules (`constants.py` & `utils.py`) change.
+
+Set `tokenized_corpus_dir` to also write a pre-tokenised corpus of the
+cleaned files, read by downstream scripts instead of the txt files.
 """
 
+import hashlib
+import json
 import os
-import re
+import shutil
 from glob import iglob
+from multiprocessing import Pool
+from typing import Iterable
 
-from utils import clean_line, clean_non_frequent, line_is_all_punc
+import tokenized_corpus
+from utils import (
+    LineCache,
+    LineCleaner,
+    load_lines_to_skip,
+    read_chunk_lines,
+    split_into_chunks,
+)
 
 input_root_dir = "./training_texts/"
 output_root_dir = "./cleaned_texts"
 overwrite_output_file = True
 
+# no. of processes used to clean files (1 to clean serially)
+no_of_workers = 1
+# files larger than this (in MB) are split in to chunks cleaned in parallel
+chunk_size_mb = 8
+
+# max no. of cleaned lines cached by each process (0 to not cache)
+line_cache_size = 50000
+
+# record time spent & lines changed by each cleaning stage, per input file
+# (and print line cache hit rates)
+instrument_stages = False
+stage_stats_file_path = os.path.join(output_root_dir, ".stage_stats.json")
+
+# only clean new or changed input files, and remove outputs of deleted ones
+incremental = False
+manifest_file_path = os.path.join(output_root_dir, ".manifest.json")
+
+# excessively repeated lines to skip (see find_repeated_lines.py)
+lines_to_skip_file_path = "./lines_to_skip.txt"
+
+# dir to write pre-tokenised corpus of cleaned files to, after cleaning
+# (see tokenized_corpus.py). `None` to not write one.
+tokenized_corpus_dir = None
+
+# files containing cleaning rules. Changes to them invalidate all outputs.
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+rules_file_paths = [
+    os.path.join(scripts_dir, "constants.py"),
+    os.path.join(scripts_dir, "utils.py"),
+    lines_to_skip_file_path,
+]
+
 # if input root dir doesn't exist raise exception
 if not os.path.isdir(input_root_dir):
     raise FileNotFoundError(f"Input Root Dir '{input_root_dir}' Does Not Exist!")
 
 
+# cache of repeated lines, shared by all files cleaned in a process
+line_cache = LineCache(line_cache_size) if line_cache_size else None
+
+lines_to_skip = load_lines_to_skip(lines_to_skip_file_path)
+
+
 def get_output_file_path(input_file_path: str):
     """
     For given input file path, creates sub dirs in output root
@@ -49,41 +108,328 @@ def get_output_file_path(input_file_path: str):
     return output_file_path
 
 
-# pattern to match all txt files in input_root_dir & sub directories
-pathname = os.path.join(input_root_dir, "**", "*.txt")
+def clean_lines(lines: "Iterable[str]", line_cleaner: LineCleaner):
+    """
+    Cleans each line read from an input file using its line cleaner,
+    and yields cleaned lines (with a newline at the end) to be written to output.
+    """
+    for line in lines:
+        final_line = line_cleaner.clean(line)
+
+        # skip if line is empty or has no Ethiopic letter after cleaning
+        if final_line == "":
+            continue
 
-# loop over each input file path
-for input_file_path in iglob(pathname, recursive=True):
-    # get output file path
-    output_file_path = get_output_file_path(input_file_path)
+        # append newline at the end
+        yield final_line + "\n"
 
-    with open(input_file_path) as input_file:
-        with open(output_file_path, "w") as output_file:
-            # read file content & loop over lines
-            for line in input_file:
-                # skip if line is space or empty
-                if line.isspace() or line == "":
-                    continue
 
-                # pecuilar cases for some files in word lists & dicts
-                if "word_list" in input_file_path:
-                    line = re.sub(r"\*", " ", line)
-                if "KBT-20071115.txt" in input_file_path:
-                    line = re.sub(r"[\[\]\(\)]", " ", line)
+def clean_chunk(task: "tuple[str, str, int, int]"):
+    """
+    Cleans lines found b/n `start` & `end` byte offsets of input file and
+    writes them to given output (or output part) file.
+
+    Returns: input file path, stage stats of line cleaner (`None`
+    if `instrument_stages` is not set) & line cache hits and misses.
+    """
+    input_file_path, output_file_path, start, end = task
+    lines = read_chunk_lines(input_file_path, start, end)
+
+    # resolves source specific cleaning once per file
+    line_cleaner = LineCleaner(
+        input_file_path, instrument_stages, line_cache, lines_to_skip
+    )
+
+    hits, misses = (line_cache.hits, line_cache.misses) if line_cache else (0, 0)
 
-                # remove or replace less frequent non allowed chars
-                allowed_line = clean_non_frequent(line)
+    with open(output_file_path, "w") as output_file:
+        output_file.writelines(clean_lines(lines, line_cleaner))
 
-                # clean line
-                cleaned_line_wrds = clean_line(allowed_line)
+    cache_stats = {"hits": 0, "misses": 0}
+    if line_cache:
+        cache_stats = {
+            "hits": line_cache.hits - hits,
+            "misses": line_cache.misses - misses,
+        }
 
-                # join words into one line
-                final_line = " ".join(cleaned_line_wrds)
+    return input_file_path, line_cleaner.stage_stats, cache_stats
+
+
+def get_clean_tasks(input_file_paths: "list[str]"):
+    """
+    Returns list of `(input path, output path, start, end)` tasks to clean
+    input files, and a dict of output file path to list of its part files
+    for files split into chunks. Tasks are sorted largest first, so that a
+    large file is not left to be cleaned last by a single worker.
+    """
+    tasks: "list[tuple[str, str, int, int]]" = []
+    parts_dict: "dict[str, list[str]]" = {}
+    chunk_size = int(chunk_size_mb * 1024 * 1024)
+
+    for input_file_path in input_file_paths:
+        # get output file path
+        output_file_path = get_output_file_path(input_file_path)
+        file_size = os.path.getsize(input_file_path)
+
+        # don't split small files or if cleaning serially
+        if no_of_workers == 1 or file_size <= chunk_size:
+            tasks.append((input_file_path, output_file_path, 0, file_size))
+            continue
+
+        # split large files in to line range chunks, each written to a part file
+        chunks = split_into_chunks(input_file_path, chunk_size)
+        part_file_paths = [
+            f"{output_file_path}.part{i}" for i in range(len(chunks))
+        ]
+        parts_dict[output_file_path] = part_file_paths
+        for (start, end), part_file_path in zip(chunks, part_file_paths):
+            tasks.append((input_file_path, part_file_path, start, end))
+
+    # largest first
+    tasks.sort(key=lambda task: task[3] - task[2], reverse=True)
+
+    return tasks, parts_dict
+
+
+def join_part_files(output_file_path: str, part_file_paths: "list[str]"):
+    """Concatenates part files, in order, into output file & removes them."""
+    with open(output_file_path, "wb") as output_file:
+        for part_file_path in part_file_paths:
+            with open(part_file_path, "rb") as part_file:
+                shutil.copyfileobj(part_file, output_file)
+            os.remove(part_file_path)
+
+
+def get_file_hash(file_path: str):
+    """Returns hex digest of SHA-256 hash of file content."""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+
+def get_rules_fingerprint():
+    """Returns a hash of all files containing cleaning rules."""
+    rules_hash = hashlib.sha256()
+    for rules_file_path in rules_file_paths:
+        if os.path.isfile(rules_file_path):
+            rules_hash.update(get_file_hash(rules_file_path).encode())
+        else:
+            rules_hash.update(b"-")
+
+    return rules_hash.hexdigest()
+
+
+def load_manifest():
+    """
+    Returns manifest of last run, or an empty one if there is no manifest.
+    If cleaning rules changed since last run, only output of each file entry
+    is kept (so all files are cleaned again).
+    """
+    manifest = {"rules_fingerprint": get_rules_fingerprint(), "files": {}}
+    if not os.path.isfile(manifest_file_path):
+        return manifest
 
-                # skip if final line is empty or all allowed non-Ethiopic
-                # +or Ethiopic punctuations
-                if line_is_all_punc(final_line):
+    with open(manifest_file_path) as manifest_file:
+        old_manifest = json.load(manifest_file)
+
+    if old_manifest.get("rules_fingerprint") == manifest["rules_fingerprint"]:
+        manifest["files"] = old_manifest["files"]
+    else:
+        # to still remove outputs of input files deleted since last run
+        manifest["files"] = {
+            input_file_path: {"output": entry["output"]}
+            for input_file_path, entry in old_manifest["files"].items()
+        }
+
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    """Writes manifest to output root dir, replacing old one."""
+    os.makedirs(output_root_dir, exist_ok=True)
+    tmp_file_path = manifest_file_path + ".tmp"
+    with open(tmp_file_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, ensure_ascii=False)
+    os.replace(tmp_file_path, manifest_file_path)
+
+
+def get_changed_files(input_file_paths: "list[str]", manifest: dict):
+    """
+    Returns input files that are new or changed since last run. Manifest
+    entries are updated for all input files, and outputs of input files
+    that no longer exist are removed along with their entries.
+    """
+    files_dict: "dict[str, dict]" = manifest["files"]
+    changed_file_paths: "list[str]" = []
+
+    for input_file_path in input_file_paths:
+        stat = os.stat(input_file_path)
+        entry = files_dict.get(input_file_path)
+        file_hash = None
+
+        # unchanged if output exists and size & mtime are the same, or if
+        # only mtime changed but content hash is the same (entries with only
+        # output are of files cleaned with old rules)
+        if entry is not None and "size" in entry and os.path.isfile(entry["output"]):
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+            if entry["size"] == stat.st_size:
+                file_hash = get_file_hash(input_file_path)
+                if entry["hash"] == file_hash:
+                    entry["mtime"] = stat.st_mtime
                     continue
 
-                # append newline at the end & write line to output file
-                output_file.write(final_line + "\n")
+        files_dict[input_file_path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": file_hash or get_file_hash(input_file_path),
+            "output": get_output_file_path(input_file_path),
+        }
+        changed_file_paths.append(input_file_path)
+
+    # remove outputs of deleted input files
+    for input_file_path in set(files_dict).difference(input_file_paths):
+        output_file_path = files_dict.pop(input_file_path)["output"]
+        if os.path.isfile(output_file_path):
+            os.remove(output_file_path)
+
+    remove_orphan_outputs()
+
+    return changed_file_paths
+
+
+def remove_orphan_outputs():
+    """
+    Removes txt files in output root dir whose input file no longer exists
+    and that are not in manifest (e.g. written before it was used, or by
+    hand), after asking for confirmation.
+    """
+    pathname = os.path.join(output_root_dir, "**", "*.txt")
+    orphan_file_paths: "list[str]" = []
+    for output_file_path in iglob(pathname, recursive=True):
+        rel_path = os.path.relpath(output_file_path, output_root_dir)
+        if not os.path.isfile(os.path.join(input_root_dir, rel_path)):
+            orphan_file_paths.append(output_file_path)
+    if not orphan_file_paths:
+        return
+
+    print("\n".join(orphan_file_paths))
+    response = input(
+        f"{len(orphan_file_paths)} files above in {output_root_dir} have no input "
+        "file. Remove them? Y/N: "
+    )
+    if response == "Y":
+        for output_file_path in orphan_file_paths:
+            os.remove(output_file_path)
+
+
+def add_stage_stats(total_stats: dict, stats: dict):
+    """Adds stage stats to total stats of same stages."""
+    for name, stage_stats in stats.items():
+        total_stage_stats = total_stats.setdefault(name, dict.fromkeys(stage_stats, 0))
+        for key, value in stage_stats.items():
+            total_stage_stats[key] += value
+
+
+def print_cache_stats(cache_stats_by_file: "dict[str, dict[str, int]]"):
+    """Prints line cache hit rate for each source group."""
+    stats_by_group: "dict[str, dict[str, int]]" = {}
+    for input_file_path, stats in cache_stats_by_file.items():
+        group = os.path.relpath(input_file_path, input_root_dir).split(os.sep)[0]
+        group_stats = stats_by_group.setdefault(group, {"hits": 0, "misses": 0})
+        group_stats["hits"] += stats["hits"]
+        group_stats["misses"] += stats["misses"]
+
+    print(f"\n{'line cache':<32}{'hits':>10}{'misses':>10}{'hit %':>8}")
+    for group, s in sorted(stats_by_group.items()):
+        total = s["hits"] + s["misses"]
+        hit_percent = s["hits"] / total * 100 if total else 0
+        print(f"{group:<32}{s['hits']:>10}{s['misses']:>10}{hit_percent:>8.1f}")
+
+
+def print_stage_stats(stats_by_file: "dict[str, dict]"):
+    """
+    Prints time spent & percentage of lines changed by each cleaning stage,
+    for each source group (dirs in input root dir), and writes stats of each
+    input file to output root dir.
+    """
+    # sum stats of files in each group
+    stats_by_group: "dict[str, dict]" = {}
+    for input_file_path, stats in stats_by_file.items():
+        group = os.path.relpath(input_file_path, input_root_dir).split(os.sep)[0]
+        add_stage_stats(stats_by_group.setdefault(group, {}), stats)
+
+    for group, stats in sorted(stats_by_group.items()):
+        total_time = sum(s["time"] for s in stats.values())
+        print(f"\n{group}")
+        print(f"{'stage':<20}{'time (s)':>10}{'time %':>8}{'changed %':>11}")
+        for name, s in stats.items():
+            time_percent = s["time"] / total_time * 100 if total_time else 0
+            changed_percent = s["changed"] / s["lines"] * 100 if s["lines"] else 0
+            print(
+                f"{name:<20}{s['time']:>10.2f}{time_percent:>8.1f}"
+                f"{changed_percent:>11.2f}"
+            )
+
+    os.makedirs(output_root_dir, exist_ok=True)
+    with open(stage_stats_file_path, "w") as stats_file:
+        json.dump(stats_by_file, stats_file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    # pattern to match all txt files in input_root_dir & sub directories
+    pathname = os.path.join(input_root_dir, "**", "*.txt")
+    input_file_paths = list(iglob(pathname, recursive=True))
+
+    if incremental:
+        manifest = load_manifest()
+        input_file_paths = get_changed_files(input_file_paths, manifest)
+
+    tasks, parts_dict = get_clean_tasks(input_file_paths)
+
+    # stage & cache stats of each input file (summed over its chunks)
+    stats_by_file: "dict[str, dict]" = {}
+    cache_stats_by_file: "dict[str, dict[str, int]]" = {}
+
+    if no_of_workers == 1:
+        results = map(clean_chunk, tasks)
+    else:
+        pool = Pool(no_of_workers)
+        # one task at a time, so that largest tasks are started first
+        results = pool.imap_unordered(clean_chunk, tasks, chunksize=1)
+
+    for input_file_path, stats, cache_stats in results:
+        if stats is not None:
+            add_stage_stats(stats_by_file.setdefault(input_file_path, {}), stats)
+        file_cache_stats = cache_stats_by_file.setdefault(
+            input_file_path, {"hits": 0, "misses": 0}
+        )
+        file_cache_stats["hits"] += cache_stats["hits"]
+        file_cache_stats["misses"] += cache_stats["misses"]
+
+    if no_of_workers != 1:
+        pool.close()
+        pool.join()
+
+    # stitch back cleaned chunks of large files in order
+    for output_file_path, part_file_paths in parts_dict.items():
+        join_part_files(output_file_path, part_file_paths)
+
+    # save manifest only after all changed files are cleaned
+    if incremental:
+        save_manifest(manifest)
+
+    # rebuild tokenised corpus if cleaned files changed since it was built
+    if tokenized_corpus_dir is not None and not tokenized_corpus.is_up_to_date(
+        output_root_dir, tokenized_corpus_dir
+    ):
+        tokenized_corpus.build_corpus(output_root_dir, tokenized_corpus_dir)
+
+    if instrument_stages:
+        print_stage_stats(stats_by_file)
+
+    if instrument_stages and line_cache_size:
+        print_cache_stats(cache_stats_by_file)
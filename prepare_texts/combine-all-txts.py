@@ -6,12 +6,46 @@ Combines all sub group txt files into one training text by shuffling lines.
 import os
 import random
 from glob import iglob
-
-from constants import LINE_LENGTH, eth_unicode_range_letters
-from utils import convert_to_eth_num
+from pathlib import Path
+
+import numpy as np
+
+from augment import augment
+from byte_stats import add_counts, get_byte_stats
+from constants import LINE_LENGTHS, PACK_BEST_FIT
+from char_coverage import (
+    get_augmentation_counts,
+    get_char_targets,
+    get_words_code_point_counts,
+    plan_injections,
+)
+from external_shuffle import ExternalShuffler
+from line_packer import pack_batches_multi, write_packed_words_multi
+from training_shards import ShardWriter
+from unicharset import Unicharset
+from utils import convert_to_eth_nums
 
 OVERWRITE = True
 
+# to shuffle words on disk using at most given memory (MB). If `None`,
+# all words are shuffled in memory.
+MAX_SHUFFLE_MEMORY_MB = None
+
+# to write training text as given no. of size-balanced shards (with a JSON
+# index, see training_shards.py) instead of one file. If `None`, one file.
+NO_OF_SHARDS = None
+
+# each char of unicharset is injected (as single char words, or as suffix of
+# random words) if it has fewer than MIN_CHAR_COUNT samples in training text
+# (or than its count in `char_count_targets`), see char_coverage.py
+UNICHARSET_FILE = (
+    "../generate_ground_truth/unicharset_files/amh.unicharset-by-tesstrain"
+)
+MIN_CHAR_COUNT = 100
+
+# seed of all random choices (added no.s, shuffle & augmentation)
+SEED = 23
+
 output_root_dir = "."
 output_file_name = "amh-layer.training_txt"
 
@@ -28,19 +62,35 @@ else:
     if response != "Y":
         exit(1)
 
-# set output file path
+# set output file path (one for each line length, with no. of chars per line
+# added to file name if more than one)
 output_file_path = os.path.join(output_root_dir, output_file_name)
-
-# check if output file already exists
-if not OVERWRITE and os.path.exists(output_file_path):
-    response = input(f"File {output_file_path} Exists. Overwrite? Y/N: ")
-    if response != "Y":
-        exit(1)
-
-all_wrds: "list[str]" = []
+if len(LINE_LENGTHS) == 1:
+    output_file_paths = [output_file_path]
+else:
+    path = Path(output_file_path)
+    output_file_paths = [
+        str(path.with_name(path.stem + f"_{n}_chars_line" + path.suffix))
+        for n in LINE_LENGTHS
+    ]
+
+# check if output files already exist
+for output_file_path in output_file_paths:
+    if not OVERWRITE and os.path.exists(output_file_path):
+        response = input(f"File {output_file_path} Exists. Overwrite? Y/N: ")
+        if response != "Y":
+            exit(1)
+
+# to store words (in memory or on disk)
+all_wrds: "list[str] | ExternalShuffler" = (
+    [] if MAX_SHUFFLE_MEMORY_MB is None else ExternalShuffler(SEED, MAX_SHUFFLE_MEMORY_MB)
+)
 # to match all files in input dir
 pathname = os.path.join(input_root_dir, "*")
 
+# code point counts of all words (to find chars to inject)
+code_point_counts = np.zeros(0, dtype=np.int64)
+
 # collect all words from each sub group in a list
 for txt_file_path in iglob(pathname):
 
@@ -48,6 +98,10 @@ for txt_file_path in iglob(pathname):
     if not os.path.isfile(txt_file_path):
         continue
 
+    code_point_counts = add_counts(
+        code_point_counts, get_byte_stats(txt_file_path)["code_point_counts"]
+    )
+
     with open(txt_file_path) as txt_file:
         for line in txt_file:
             # skip empty/space lines
@@ -57,115 +111,119 @@ for txt_file_path in iglob(pathname):
 
             all_wrds.extend(line.split())
 
-# add some chars as single words
-add_chrs_dict = {
-    "*": 200,
-    "+": 230,
-    "<": 200,
-    ">": 200,
-    "=": 300,
-    "|": 200,
-    "ሗ": 30,
-    "ጷ": 100,
-    "ጱ": 50,
-    "ዧ": 100,
-    "ኧ": 100,
-    "ቯ": 100,
-    "ቩ": 100,
-    "ሧ": 100,
-    "ሗ": 100,
-    "፡": 50000,
-    "።": 10000,
-    "፣": 2000,
-    "፤": 3000,
-    "፥": 3000,
-    "፦": 2000,
-}
-
-for ch in add_chrs_dict:
-    all_wrds.extend([ch] * add_chrs_dict[ch])
+rand = random.Random(SEED)
 
 # add Ethiopic no.s as single words and 'ቊ' before random 250 no.s
-to_add_nums = random.Random().sample(range(1, 100), 50)
-to_add_nums.extend(random.Random().sample(range(100, 400), 100))
-to_add_nums.extend(random.Random().sample(range(400, 1000), 100))
-for n in range(1, 10000):
-    eth_num = convert_to_eth_num(n)
-    if 2500 >= n >= 40:
-        # lacking in source texts: '፵፶፷፸፹፺'
-        if int(str(n)[-2]) in range(4, 10):
-            all_wrds.extend([eth_num] * 2)
-        # for ambigious pairs: '፮፮','፰፷','፺ን'
-        if ("6" in str(n) and "7" in str(n)) or (str(n)[-2] in "689"):
-            all_wrds.extend([eth_num] * 2)
-    else:
-        all_wrds.extend([eth_num])
-
-    # for 'ቊ'
-    if n in to_add_nums:
-        all_wrds.extend(["ቊ" + eth_num])
+to_add_nums = rand.sample(range(1, 100), 50)
+to_add_nums.extend(rand.sample(range(100, 400), 100))
+to_add_nums.extend(rand.sample(range(400, 1000), 100))
+
+nums = np.arange(1, 10000)
+tens = nums // 10 % 10
+digits = [nums // 10**i % 10 for i in range(4)]
+has_6_and_7 = np.any([d == 6 for d in digits], axis=0) & np.any(
+    [d == 7 for d in digits], axis=0
+)
+# no. of copies of each no. (one if not b/n 40 & 2500)
+no_of_copies = np.where(
+    (nums >= 40) & (nums <= 2500),
+    # lacking in source texts: '፵፶፷፸፹፺'
+    2 * (tens >= 4)
+    # for ambigious pairs: '፮፮','፰፷','፺ን'
+    + 2 * (has_6_and_7 | np.isin(tens, [6, 8, 9])),
+    1,
+)
+# for 'ቊ', added after copies of the no.
+add_vu = np.isin(nums, to_add_nums)
+
+num_wrds = np.repeat(convert_to_eth_nums(nums).astype(object), no_of_copies + add_vu)
+vu_indices = (np.cumsum(no_of_copies + add_vu) - 1)[add_vu]
+num_wrds[vu_indices] = "ቊ" + num_wrds[vu_indices]
+num_wrds = num_wrds.tolist()
 
 # to add 500 '፼'
-nums = random.Random().sample(range(10000, 1000000), 400)
-nums.extend(random.Random().sample(range(1000000, 100000000), 100))
-for n in nums:
-    all_wrds.extend([convert_to_eth_num(n)])
+nums = rand.sample(range(10000, 1000000), 400)
+nums.extend(rand.sample(range(1000000, 100000000), 100))
+num_wrds.extend(convert_to_eth_nums(nums).tolist())
 
+all_wrds.extend(num_wrds)
+code_point_counts = add_counts(code_point_counts, get_words_code_point_counts(num_wrds))
 
 # add single quote pairs to single random words
 single_quotes_dict = {"‹›": 400, "''": 300}
-for q, k in single_quotes_dict.items():
-    to_add_indicies = random.Random().sample(range(0, len(all_wrds)), k)
-    for i in to_add_indicies:
-        w = all_wrds[i]
-        if all([ord(c) in eth_unicode_range_letters for c in w]):
-            all_wrds[i] = q[0] + w + q[1]
 
 # add start and end quotes to d/t random words
 strt_quotes_dict = {"“": 1200, "[": 400, "'": 500}
-for q, k in strt_quotes_dict.items():
-    to_add_indicies = random.Random().sample(range(0, len(all_wrds)), k)
-    for i in to_add_indicies:
-        w = all_wrds[i]
-        if all([ord(c) in eth_unicode_range_letters for c in w]):
-            all_wrds[i] = q + w
-
-# add end quotes and ethiopic puncs to d/t random words
-end_quotes_dict = {
-    "”": 1200,
-    "]": 400,
-    "'": 500,
-    "፡": 150000,
-    "።": 70000,
-    "፣": 20000,
-    "፤": 15000,
-    "፥": 15000,
-    "፦": 10000,
+
+# add end quotes to d/t random words
+end_quotes_dict = {"”": 1200, "]": 400, "'": 500}
+
+# (prefix, suffix, no. of words) added to distinct random words of Ethiopic
+# letters only (see augment.py)
+augmentations = (
+    [(q[0], q[1], k) for q, k in single_quotes_dict.items()]
+    + [(q, "", k) for q, k in strt_quotes_dict.items()]
+    + [("", q, k) for q, k in end_quotes_dict.items()]
+)
+aug_counts = get_augmentation_counts(augmentations)
+code_point_counts = add_counts(code_point_counts, aug_counts)
+
+# min no. of samples of chars needing more than MIN_CHAR_COUNT (Ethiopic puncs
+# are only injected as many as they lack, as suffix of random words)
+char_count_targets = {
+    "*": 200,
+    "+": 230,
+    "<": 200,
+    ">": 200,
+    "=": 300,
+    "|": 200,
+    "፡": 200000,
+    "።": 80000,
+    "፣": 22000,
+    "፤": 18000,
+    "፥": 18000,
+    "፦": 12000,
 }
-for q, k in end_quotes_dict.items():
-    to_add_indicies = random.Random().sample(range(0, len(all_wrds)), k)
-    for i in to_add_indicies:
-        w = all_wrds[i]
-        if all([ord(c) in eth_unicode_range_letters for c in w]):
-            all_wrds[i] = w + q
-
-# shuffle words
-random.Random(23).shuffle(all_wrds)
-
-all_wrds_len = len(all_wrds)
-wrd_index = 0  # current word index in list
-
-# write to output file trimming line to max LINE_LENGTH chars
-with open(output_file_path, "w") as output_file:
-    while wrd_index < all_wrds_len:
-        line = ""
-        # concat words into line of LINE_LENGTH
-        while len(line) + len(all_wrds[wrd_index]) < LINE_LENGTH:
-            line += all_wrds[wrd_index] + " "
-            wrd_index += 1
-            if not wrd_index < all_wrds_len:
-                break
-
-        # write to output file
-        if not line.isspace():
-            output_file.write(line.strip() + "\n")
+
+# chars injected as suffix of random words (instead of as single char words)
+suffix_inject_chrs = {"፡", "።", "፣", "፤", "፥", "፦"}
+
+# inject chars lacking samples (as many as they lack)
+char_targets = get_char_targets(
+    Unicharset.load(UNICHARSET_FILE), MIN_CHAR_COUNT, char_count_targets
+)
+injections = plan_injections(code_point_counts, char_targets)
+for ch, k in injections.items():
+    if ch in suffix_inject_chrs:
+        augmentations.append(("", ch, k))
+    else:
+        all_wrds.extend([ch] * k)
+print(f"Injected {sum(injections.values())} chars: {injections}")
+
+# shuffle words (words on disk are shuffled when iterated)
+if isinstance(all_wrds, list):
+    random.Random(SEED).shuffle(all_wrds)
+
+augmented_wrds = augment(all_wrds, augmentations, SEED)
+
+# write to output file (or shards) of each line length, trimming line to max
+# line length chars (words are packed for all line lengths in one pass)
+if NO_OF_SHARDS is None:
+    output_files = [open(path, "w") for path in output_file_paths]
+    try:
+        write_packed_words_multi(
+            output_files, augmented_wrds, LINE_LENGTHS, PACK_BEST_FIT
+        )
+    finally:
+        for output_file in output_files:
+            output_file.close()
+else:
+    shard_writers = [ShardWriter(path, NO_OF_SHARDS) for path in output_file_paths]
+    for batches in pack_batches_multi(augmented_wrds, LINE_LENGTHS, PACK_BEST_FIT):
+        for shard_writer, lines in zip(shard_writers, batches):
+            shard_writer.write_lines(lines)
+    for shard_writer in shard_writers:
+        shard_writer.close()
+
+if isinstance(all_wrds, ExternalShuffler):
+    all_wrds.close()
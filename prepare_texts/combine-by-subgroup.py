@@ -3,21 +3,54 @@
 Combines text files by sub groups. After filtering words using a treshold
 frequency, shuffles and writes a maximum LINE_LENGTH lines to output file
 for each subgroup.
+
+Set `NO_OF_WORKERS` to read & filter files (in chunks) in parallel. Freqs are
+still updated in file order, so output is the same as when run serially. At
+most `MAX_PENDING_CHUNKS` chunk results are read ahead (held in memory) while
+words of a sub group are filtered.
 """
 
 import os
 import random
 import re
+from collections import deque
 from glob import iglob
+from multiprocessing import Pool
 
-from constants import LINE_LENGTH, puncs_to_strip_for_freq
-
+from constants import LINE_LENGTH, PACK_BEST_FIT, freq_filter_rules
+from external_shuffle import ExternalShuffler
+from freq_filter import FreqFilter
+from line_packer import write_packed_words
+from tokenized_corpus import TokenizedCorpus
+from utils import read_chunk_lines, split_into_chunks
 
 output_root_dir = "./combined_txts"
 input_root_dir = "./cleaned_texts"
 
 OVERWRITE = True
 
+# no. of processes used to read & filter files (1 to combine serially)
+NO_OF_WORKERS = 1
+# files are read in chunks of about this size (MB) when run in parallel
+CHUNK_SIZE_MB = 8
+# max no. of chunks read ahead of the chunk being filtered
+MAX_PENDING_CHUNKS = 2 * NO_OF_WORKERS
+
+# to shuffle words on disk using at most given memory (MB). If `None`,
+# all words of a sub group are shuffled in memory.
+MAX_SHUFFLE_MEMORY_MB = None
+
+# to count word freqs approximately using a count-min sketch of given width
+# (bounded memory, for huge sub groups). If `None`, freqs are counted exactly.
+FREQ_SKETCH_WIDTH = None
+
+# pre-tokenised corpus of cleaned txts to read words from (see
+# tokenized_corpus.py), a file per task. If `None`, words are read from txt files.
+tokenized_corpus_dir = None
+
+# corpus opened in each process (see `load_corpus`)
+corpus: "TokenizedCorpus | None" = None
+
 # dirs in input root dir
 input_sub_groups = {
     "articles",
@@ -25,191 +58,165 @@ input_sub_groups = {
     "enh_corpus_by_year",
 }
 
-# if output dir doesn't exist create one
-if not os.path.isdir(output_root_dir):
-    os.mkdir(output_root_dir)
-else:
-    # ask for confirmation
-    response = input(f"Output dir {output_root_dir} exist. Continue? Y/N: ")
-    if response != "Y":
-        exit(1)
-
-wrds_freq_rel_amh_dict: "dict[str, int]" = {}
-
-
-def filter_religious_amh(line_wrds: "list[str]"):
-    """Filters list of words by removing excessively repeated
-    sub_group specific words."""
-    # strip unwanted non-Ethiopic puncs from each word
-    wrds = [w.strip("()./-") for w in line_wrds]
-    filtered_wrds = []
-    # loop over each word
-    for w in wrds:
-
-        # avoid bible chapter quotes
-        # if re.search(
-        #     r"[\u1369-\u137D]+[\u1200-\u135a\.]+|[\u1200-\u135a\.]+[\u1369-\u137D]+", w
-        # ):
-        #     continue
-
-        # replace Ethiopic 100-199 representations (do not use ፩ before ፻)
-        w = re.sub(r"፩፻", "፻", w)
-
-        w_dict = w.strip("".join(puncs_to_strip_for_freq))
-
-        # freq for single chars
-        if len(w_dict) == 1:
-            wrds_freq_rel_amh_dict[w_dict] = wrds_freq_rel_amh_dict.get(w_dict, 0) + 4
-
-        # for arabic numbers
-        elif all([c in range(0, 10) for c in w]):
-            wrds_freq_rel_amh_dict[w_dict] = wrds_freq_rel_amh_dict.get(w_dict, 0) + 3
-
-        # for ethiopic numbers
-        # elif all([c in range(0x1369, 0x137D) for c in w]):
-        #     wrds_freq_rel_amh_dict[w_dict] = wrds_freq_rel_amh_dict.get(w_dict, 0) + 4
-
-        else:
-            wrds_freq_rel_amh_dict[w_dict] = wrds_freq_rel_amh_dict.get(w_dict, 0) + 1
-
-        # if word is below freq threshold add to list
-        if wrds_freq_rel_amh_dict[w_dict] < 10:
-            filtered_wrds.append(w)
-
-    return filtered_wrds
-
-
-wrds_freq_enh_dict: "dict[str, int]" = {}
-
-
-def filter_enh_corpus(line_wrds: "list[str]"):
-    """Filters list of words by removing excessively repeated
-    sub_group specific words."""
-
-    filtered_wrds = []
-    # loop over each word
-    for w in line_wrds:
-
-        w_dict = w.strip("".join(puncs_to_strip_for_freq))
-
-        # for arabic numbers
-        if re.search(r"[0-9]", w_dict):
-            wrds_freq_enh_dict[w_dict] = wrds_freq_enh_dict.get(w_dict, 0) + 4
-
-        # freq for single chars
-        elif len(w_dict) == 1:
-            wrds_freq_enh_dict[w_dict] = wrds_freq_enh_dict.get(w_dict, 0) + 15
-
-        else:
-            wrds_freq_enh_dict[w_dict] = wrds_freq_enh_dict.get(w_dict, 0) + 1
 
-        # if word is below freq threshold add to list
-        if wrds_freq_enh_dict[w_dict] < 31:
-            filtered_wrds.append(w)
-
-    return filtered_wrds
-
-
-wrds_freq_articles: "dict[str, int]" = {}
-
-
-def filter_articles(line_wrds: "list[str]"):
-    """Filters list of words by removing excessively repeated
-    sub_group specific words."""
-
-    filtered_wrds = []
-    # loop over each word
-    for w in line_wrds:
-
-        # skip excessively repeated year tags
-        if re.search(r"1998|2002", w):
-            continue
-
-        w_dict = w.strip("".join(puncs_to_strip_for_freq))
-
-        # for arabic numbers
-        if re.search(r"[0-9]", w_dict):
-            wrds_freq_articles[w_dict] = wrds_freq_articles.get(w_dict, 0) + 4
-
-        # freq for single chars
-        elif len(w_dict) == 1:
-            wrds_freq_articles[w_dict] = wrds_freq_articles.get(w_dict, 0) + 20
+def get_sub_group_tasks(sub_grp: str):
+    """
+    Returns list of `(sub group, file path, start, end)` tasks to read
+    chunks of all txt files in sub group, in order.
+    """
+    # to match all txt file in sub group (read in sorted order, as in corpus)
+    pathname = os.path.join(input_root_dir, sub_grp, "**", "*.txt")
+    chunk_size = int(CHUNK_SIZE_MB * 1024 * 1024)
 
+    tasks: "list[tuple[str, str, int, int]]" = []
+    for txt_file_path in sorted(iglob(pathname, recursive=True)):
+        # don't split files if combining serially
+        if NO_OF_WORKERS == 1:
+            chunks = [(0, os.path.getsize(txt_file_path))]
         else:
-            wrds_freq_articles[w_dict] = wrds_freq_articles.get(w_dict, 0) + 1
-
-        # if word is below freq threshold add to list
-        if wrds_freq_articles[w_dict] < 51:
-            filtered_wrds.append(w)
+            chunks = split_into_chunks(txt_file_path, chunk_size)
+        tasks.extend((sub_grp, txt_file_path, start, end) for start, end in chunks)
+
+    return tasks
+
+
+def get_corpus_tasks(sub_grp: str):
+    """
+    Returns list of `(sub group, file index, 0, 0)` tasks to read lines of
+    all files of sub group from corpus, in order.
+    """
+    return [(sub_grp, i, 0, 0) for i in corpus.get_sub_dir_file_indices(sub_grp)]
+
+
+def load_corpus():
+    """Opens corpus (used as initializer of pool processes)."""
+    global corpus
+    corpus = TokenizedCorpus(tokenized_corpus_dir)
+
+
+def read_chunk(task: "tuple[str, str | int, int, int]"):
+    """
+    Returns words in lines b/n `start` & `end` byte offsets of file (or in
+    lines of file of given index in corpus), prepared for freq filtering as
+    `(words, keys, weights)` if sub group has a filter rule, else as
+    `(words, None, None)`.
+    """
+    sub_grp, txt_file_path, start, end = task
+    if corpus is not None:
+        lines = corpus.get_lines(txt_file_path)
+    else:
+        lines = read_chunk_lines(txt_file_path, start, end)
+
+    # filter excessively repeated sub group specific words (see constants.py)
+    if sub_grp in freq_filter_rules:
+        return FreqFilter(freq_filter_rules[sub_grp]).prepare_lines(lines)
+
+    words: "list[str]" = []
+    for line in lines:
+        words.extend(line.split())
+
+    return words, None, None
+
+
+def read_chunks(pool: Pool, tasks: "list[tuple[str, str, int, int]]"):
+    """
+    Yields results of `read_chunk` for tasks in order, with at most
+    `MAX_PENDING_CHUNKS` tasks submitted to pool ahead of the yielded one.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= MAX_PENDING_CHUNKS:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(read_chunk, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def write_sub_group(
+    output_file_path: str, sub_group_words: "list[str] | ExternalShuffler"
+):
+    """Shuffles words of sub group & writes them to output file."""
+    # shuffle words (words on disk are shuffled when iterated)
+    if isinstance(sub_group_words, list):
+        random.Random(23).shuffle(sub_group_words)
 
-    return filtered_wrds
-
-
-# combine texts by subgroup
-for sub_grp in input_sub_groups:
-    sub_grp = sub_grp.strip("/")  # for path.join
+    # write to output file, wrapping line to max LINE_LENGTH chars
+    with open(output_file_path, "w") as output_file:
+        write_packed_words(output_file, sub_group_words, LINE_LENGTH, PACK_BEST_FIT)
 
-    # to match all txt file in sub group
-    pathname = os.path.join(input_root_dir, sub_grp, "**", "*.txt")
+    if isinstance(sub_group_words, ExternalShuffler):
+        sub_group_words.close()
 
-    # set output file path
-    output_file_name = re.sub(r"\/", "_", sub_grp)
-    output_file_path = os.path.join(output_root_dir, output_file_name)
 
-    # check if output file already exists
-    if not OVERWRITE and os.path.exists(output_file_path):
-        response = input(f"File {output_file_path} Exists. Overwrite? Y/N: ")
+if __name__ == "__main__":
+    # if output dir doesn't exist create one
+    if not os.path.isdir(output_root_dir):
+        os.mkdir(output_root_dir)
+    else:
+        # ask for confirmation
+        response = input(f"Output dir {output_root_dir} exist. Continue? Y/N: ")
         if response != "Y":
             exit(1)
 
-    # collect all words for each sub group in a list
-    sub_group_words: "list[str]" = []
-    for txt_file_path in iglob(pathname, recursive=True):
-        with open(txt_file_path) as txt_file:
-            lines = txt_file.readlines()
-            for line in lines:
-                line = line.strip()
-
-                # avoid newspaper time stamp footers
-                if sub_grp in {"articles", "enh_corpus_by_year"} and re.search(
-                    r"^ከ[^0-9]{,20}[0-9]{1,2} ቀን [0-9]{4}$", line
-                ):
-                    continue
-
-                # split line into list of words
-                line_wrds = line.split()
-
-                # filter words for religiou amh subgroup
-                if "religious_amh" in sub_grp:
-                    line_wrds = filter_religious_amh(line_wrds)
-
-                # filter words for articles subgroup
-                if sub_grp == "articles":
-                    line_wrds = filter_articles(line_wrds)
-
-                # filter words for enh_corpus_by_year subgroup
-                if sub_grp == "enh_corpus_by_year":
-                    line_wrds = filter_enh_corpus(line_wrds)
-
-                sub_group_words.extend(line_wrds)
-
-    # shuffle words
-    random.Random(23).shuffle(sub_group_words)
-
-    sub_group_wrds_len = len(sub_group_words)
-    wrd_index = 0  # current word index in list
-
-    # write to output file, wrapping line to max LINE_LENGTH chars
-    with open(output_file_path, "w") as output_file:
-        while wrd_index < sub_group_wrds_len:
-            line = ""
-            # concat words into line of LINE_LENGTH
-            while len(line) + len(sub_group_words[wrd_index]) < LINE_LENGTH:
-                line += sub_group_words[wrd_index] + " "
-                wrd_index += 1
-                if not wrd_index < sub_group_wrds_len:
-                    break
-
-            # write to output file
-            if not line.isspace():
-                output_file.write(line.strip() + "\n")
+    sub_grps = [sub_grp.strip("/") for sub_grp in input_sub_groups]  # for path.join
+
+    output_file_paths: "dict[str, str]" = {}
+    for sub_grp in sub_grps:
+        # set output file path
+        output_file_name = re.sub(r"\/", "_", sub_grp)
+        output_file_path = os.path.join(output_root_dir, output_file_name)
+
+        # check if output file already exists
+        if not OVERWRITE and os.path.exists(output_file_path):
+            response = input(f"File {output_file_path} Exists. Overwrite? Y/N: ")
+            if response != "Y":
+                exit(1)
+        output_file_paths[sub_grp] = output_file_path
+
+    get_tasks = get_sub_group_tasks
+    if tokenized_corpus_dir is not None:
+        load_corpus()
+        if not corpus.is_up_to_date():
+            print(f'Tokenized corpus "{tokenized_corpus_dir}" is out of date!')
+            exit(1)
+        get_tasks = get_corpus_tasks
+
+    # chunks of all sub groups are read in parallel, and results used in order
+    sub_grp_tasks = {sub_grp: get_tasks(sub_grp) for sub_grp in sub_grps}
+    tasks = [task for sub_grp in sub_grps for task in sub_grp_tasks[sub_grp]]
+    pool = None
+    if NO_OF_WORKERS == 1:
+        results = map(read_chunk, tasks)
+    elif tokenized_corpus_dir is not None:
+        pool = Pool(NO_OF_WORKERS, initializer=load_corpus)
+        results = read_chunks(pool, tasks)
+    else:
+        pool = Pool(NO_OF_WORKERS)
+        results = read_chunks(pool, tasks)
+
+    # combine texts by subgroup
+    for sub_grp in sub_grps:
+        # collect all words for each sub group in a list (or shuffler on disk)
+        sub_group_words: "list[str] | ExternalShuffler" = (
+            []
+            if MAX_SHUFFLE_MEMORY_MB is None
+            else ExternalShuffler(23, MAX_SHUFFLE_MEMORY_MB)
+        )
+        freq_filter = None
+        if sub_grp in freq_filter_rules:
+            freq_filter = FreqFilter(freq_filter_rules[sub_grp], FREQ_SKETCH_WIDTH)
+
+        # update freqs with words of each chunk in order
+        for _ in sub_grp_tasks[sub_grp]:
+            words, keys, weights = next(results)
+            if freq_filter is not None:
+                words = freq_filter.apply(words, keys, weights)
+            sub_group_words.extend(words)
+
+        # written in main process (chunks of next sub group are read meanwhile)
+        write_sub_group(output_file_paths[sub_grp], sub_group_words)
+        del sub_group_words
+
+    if pool is not None:
+        pool.close()
+        pool.join()
@@ -6,17 +6,32 @@ writes a maximum LINE_LENGTH lines to output file.
 """
 
 import os
-import re
 from glob import iglob
 
 # from pathlib import Path
 import random
 
-from constants import LINE_LENGTH, puncs_to_strip_for_freq
+from constants import LINE_LENGTH, PACK_BEST_FIT, freq_filter_rules
+from external_shuffle import ExternalShuffler
+from freq_filter import FreqFilter
+from line_packer import write_packed_words
+from tokenized_corpus import TokenizedCorpus
 
 OVERWRITE = True
 
+# to shuffle words on disk using at most given memory (MB). If `None`,
+# all words are shuffled in memory.
+MAX_SHUFFLE_MEMORY_MB = None
+
+# to count word freqs approximately using a count-min sketch of given width
+# (bounded memory). If `None`, freqs are counted exactly.
+FREQ_SKETCH_WIDTH = None
+
 input_root_dir = "./cleaned_texts"
+
+# pre-tokenised corpus of cleaned txts to read words from (see
+# tokenized_corpus.py). If `None`, words are read from txt files.
+tokenized_corpus_dir = None
 output_root_dir = "./combined_txts"
 
 output_file_name = "dictionaries_and_word_lists"
@@ -45,89 +60,52 @@ if not OVERWRITE and os.path.exists(output_file_path):
     if response != "Y":
         exit(1)
 
-all_wrds_dict = {}  # to store wrd freq. used to filter words
-all_wrds = []  # to store words
+# to filter words using freq (see `freq_filter_rules` in constants.py)
+freq_filter = FreqFilter(freq_filter_rules[output_file_name], FREQ_SKETCH_WIDTH)
+# to store words (in memory or on disk)
+all_wrds: "list[str] | ExternalShuffler" = (
+    [] if MAX_SHUFFLE_MEMORY_MB is None else ExternalShuffler(23, MAX_SHUFFLE_MEMORY_MB)
+)
+
+corpus = None
+if tokenized_corpus_dir is not None:
+    corpus = TokenizedCorpus(tokenized_corpus_dir)
+    if not corpus.is_up_to_date():
+        print(f'Tokenized corpus "{tokenized_corpus_dir}" is out of date!')
+        exit(1)
 
-# flter words based on freq, and store in list
-for sub_grp in input_sub_groups:
-    sub_grp = sub_grp.strip("/")  # for path.join
 
-    # to match all txt file in sub group
+def read_sub_group_files(sub_grp: str):
+    """Yields lines of each txt file of sub group (from corpus if given)."""
+    # lines of each file in corpus (files in sorted order)
+    if corpus is not None:
+        for file_index in corpus.get_sub_dir_file_indices(sub_grp):
+            yield corpus.get_lines(file_index)
+        return
+
+    # to match all txt file in sub group (read in sorted order, as in corpus)
     pathname = os.path.join(input_root_dir, sub_grp, "**", "*.txt")
 
-    for txt_file_path in iglob(pathname, recursive=True):
+    for txt_file_path in sorted(iglob(pathname, recursive=True)):
         with open(txt_file_path) as txt_file:
-            lines = txt_file.readlines()
-            for line in lines:
-                # strip unwanted non-Ethiopic puncs from each word
-                wrds = [w.strip("()./-") for w in line.split()]
-
-                # loop over each word
-                for w in wrds:
-                    # remove `-` used to show multiple forms of root words
-                    if w.startswith("ተን-") and w.count("-") == 1:
-                        w = w.replace("-", "")
-
-                    # skip repetitive bible quotes used in dictionaries
-                    # if re.search(r"[\u1200-\u1368]{2,3}[\u1369-\u137c]{1,2}", w):
-                    #     continue
-
-                    # skip words with puncs that makes words unusable
-                    if re.search(r"[\.\(\)\-\[\]]", w):
-                        continue
-
-                    # remove words with pecuilar Ethiopic lettern & no. comb
-                    if re.search(r"(ድ|ተ|ገ|ቁ)[\u1369-\u137C]+", w):
-                        continue
-
-                    # replace Ethiopic no.s prefix with common form
-                    if re.search(r"^ባ[\u1369-\u137C0-9]+", w):
-                        w = "በ" + w[1:]
-                    if re.search(r"^ካ[\u1369-\u137C0-9]+", w):
-                        w = "ከ" + w[1:]
-
-                    w_dict = w.strip("".join(puncs_to_strip_for_freq))
-
-                    # for single char words, use max of 2 of each form (2*2<5)
-                    if len(w_dict) == 1:
-                        all_wrds_dict[w_dict] = all_wrds_dict.get(w_dict, 0) + 2
-
-                    # for abbreviations, use only one of each form (1*4<5)
-                    elif re.search(r"[\u1200-\u135a]+/[\u1200-\u135a]+", w_dict):
-                        all_wrds_dict[w_dict] = all_wrds_dict.get(w_dict, 0) + 4
-
-                    # for Ethiopic no.s with letter prefix & suffix, store two of each form
-                    # elif re.search(
-                    #     r"^(ለ|ክ|በ|የ)?[\u1369-\u137C0-9]+(ኛ|ው|ት|ቱ|ና|ም|ሩ|ኝ|ኙ|ድ|ዱ)*",
-                    #     w_dict,
-                    # ):
-                    #     all_wrds_dict[w_dict] = all_wrds_dict.get(w_dict, 0) + 2
-
-                    # for the rest store at most 4 of each form (4*1<5)
-                    else:
-                        all_wrds_dict[w_dict] = all_wrds_dict.get(w_dict, 0) + 1
-
-                    # if word is below freq threshold add to list
-                    if all_wrds_dict[w_dict] < 5:
-                        all_wrds.append(w)
-
-# shuffle words
-random.Random(23).shuffle(all_wrds)
-
-all_wrds_len = len(all_wrds)
-wrd_index = 0  # current word index in list
+            yield txt_file
+
+
+# flter words based on freq, and store in list
+for sub_grp in sorted(input_sub_groups):
+    sub_grp = sub_grp.strip("/")  # for path.join
+
+    for file_lines in read_sub_group_files(sub_grp):
+        # filter words of all lines in file at once
+        all_wrds.extend(freq_filter.filter_lines(file_lines))
+
+# shuffle words (words on disk are shuffled when iterated)
+if isinstance(all_wrds, list):
+    random.Random(23).shuffle(all_wrds)
 
 # write to output file trimming line to max LINE_LENGTH chars
 with open(output_file_path, "w") as output_file:
-    while wrd_index < all_wrds_len:
-        line = ""
-        # concat words into line of LINE_LENGTH
-        while len(line) + len(all_wrds[wrd_index]) < LINE_LENGTH:
-            line += all_wrds[wrd_index] + " "
-            wrd_index += 1
-            if not wrd_index < all_wrds_len:
-                break
-
-        # write to output file
-        if not line.isspace():
-            output_file.write(line.strip() + "\n")
+    write_packed_words(output_file, all_wrds, LINE_LENGTH, PACK_BEST_FIT)
+
+if isinstance(all_wrds, ExternalShuffler):
+    all_wrds.close()
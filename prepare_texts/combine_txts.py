@@ -6,9 +6,14 @@ import os
 
 from glob import iglob
 from pathlib import Path
-from random import shuffle
+import random
 
-from constants import LINE_LENGTH
+import numpy as np
+
+from constants import LINE_LENGTHS, PACK_BEST_FIT
+from external_shuffle import ExternalShuffler
+from line_packer import write_packed_words_multi
+from tokenized_corpus import TokenizedCorpus
 
 input_root_dir = './cleaned_texts'
 input_sub_groups = {    # sub dirs in root dir (no / at start)
@@ -18,43 +23,70 @@ input_sub_groups = {    # sub dirs in root dir (no / at start)
 
 ouput_file_path = './combined_w_corpus_80_l.txt'
 
-# add no chars per line to output file path
+# to shuffle words on disk using at most given memory (MB). If `None`, all
+# words are shuffled in memory. Words are shuffled with given seed either way.
+max_shuffle_memory_mb = None
+shuffle_seed = 23
+
+# pre-tokenised corpus of input root dir to read words from (see
+# tokenized_corpus.py). If `None`, words are read from txt files.
+tokenized_corpus_dir = None
+
+# add no chars per line to output file path (one for each line length)
 ouput_file_path = Path(ouput_file_path)
-ouput_file_path = ouput_file_path.with_name(
-    ouput_file_path.stem +
-    f'_{LINE_LENGTH}_chars_line' + ouput_file_path.suffix
-)
-
-# make sure output file doesn't exist
-assert not ouput_file_path.exists(), \
-    f'Output file "{ouput_file_path}" already Exists!'
-
-# add all words in input files into one list
-all_words = []
-
-for sub_grp in input_sub_groups:
-    sub_grp = sub_grp.strip('/')    # for path.join
-    # to match all txt file in sub group
-    pathname = os.path.join(input_root_dir, sub_grp, '**', '*.txt')
-
-    for txt_file_path in iglob(pathname, recursive=True):
-        with open(txt_file_path) as txt_file:
-            for line in txt_file:
-                all_words.extend(line.split())
-
-# random shuffle words
-shuffle(all_words)
-all_wrds_len = len(all_words)
-
-
-wrd_index = 0       # current word index in list
-with open(ouput_file_path, 'x') as output_file:
-    while wrd_index < all_wrds_len:
-        line = ''
-        while len(line) + len(all_words[wrd_index]) < LINE_LENGTH:
-            line += all_words[wrd_index] + ' '
-            wrd_index += 1
-            if not wrd_index < all_wrds_len:
-                break
-        if not line.isspace():
-            output_file.write(line.strip() + '\n')
+ouput_file_paths = [
+    ouput_file_path.with_name(
+        ouput_file_path.stem +
+        f'_{line_length}_chars_line' + ouput_file_path.suffix
+    )
+    for line_length in LINE_LENGTHS
+]
+
+# make sure output files don't exist
+for path in ouput_file_paths:
+    assert not path.exists(), f'Output file "{path}" already Exists!'
+
+if tokenized_corpus_dir is not None:
+    corpus = TokenizedCorpus(tokenized_corpus_dir)
+    assert corpus.is_up_to_date(), \
+        f'Tokenized corpus "{tokenized_corpus_dir}" is out of date!'
+
+    # shuffle ids of all words in memory, and look up words when writing
+    file_indices = []
+    for sub_grp in input_sub_groups:
+        file_indices.extend(corpus.get_sub_dir_file_indices(sub_grp))
+    all_ids = corpus.get_ids(file_indices)
+    np.random.default_rng(shuffle_seed).shuffle(all_ids)
+    all_words = corpus.iter_words(all_ids)
+
+else:
+    # add all words in input files into one list (or shuffler on disk)
+    if max_shuffle_memory_mb is None:
+        all_words = []
+    else:
+        all_words = ExternalShuffler(shuffle_seed, max_shuffle_memory_mb)
+
+    for sub_grp in input_sub_groups:
+        sub_grp = sub_grp.strip('/')    # for path.join
+        # to match all txt file in sub group
+        pathname = os.path.join(input_root_dir, sub_grp, '**', '*.txt')
+
+        for txt_file_path in iglob(pathname, recursive=True):
+            with open(txt_file_path) as txt_file:
+                for line in txt_file:
+                    all_words.extend(line.split())
+
+    # random shuffle words (words on disk are shuffled when iterated)
+    if isinstance(all_words, list):
+        random.Random(shuffle_seed).shuffle(all_words)
+
+# pack words for all line lengths in one pass
+output_files = [open(path, 'x') for path in ouput_file_paths]
+try:
+    write_packed_words_multi(output_files, all_words, LINE_LENGTHS, PACK_BEST_FIT)
+finally:
+    for output_file in output_files:
+        output_file.close()
+
+if isinstance(all_words, ExternalShuffler):
+    all_words.close()
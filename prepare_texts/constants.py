@@ -190,6 +190,17 @@ eth_letters_avoid = {
 }
 """less frequent Ethiopic letters to be avoided"""
 
+non_frequent_eth_substitutes = {
+    "ጕ": "ጉ",
+    "ኵ": "ኩ",
+    "ዅ": "ኹ",
+    "ኍ": "ኁ",
+    "፧": "?",
+    "፠": " ",
+    "፨": " ",
+}
+"""substitutes (frequent forms) for less frequent Ethiopic chars"""
+
 # 3 comb marks & '፠', '፧', '፨' [TO BE ADDED? 0x1366 (፦)]
 eth_puncs_avoid = {0x135D, 0x135E, 0x135F, 0x1360, 0x1367, 0x1368}
 """less frequent Ethiopic punctuations to be avoided"""
@@ -292,6 +303,15 @@ lines_to_skip = {"ሰለ እዚህ ዜና ዋርካ ስር በአማርኛ ይ
 # no. of chars in a line (used for combining cleaned txt files)
 LINE_LENGTH = 75
 
+# line lengths to write training texts for (by `combine-all-txts.py` &
+# `combine_txts.py`), one output per line length, packed from the same
+# shuffled words in one pass (e.g. `[60, 75, 80]`)
+LINE_LENGTHS = [LINE_LENGTH]
+
+# fill lines closer to LINE_LENGTH by packing shorter words into the space left
+# at line ends, instead of packing words strictly in order (see line_packer.py)
+PACK_BEST_FIT = False
+
 # puncs from wrd before updating freqency
 puncs_to_strip_for_freq = {
     "፠",
@@ -334,6 +354,76 @@ puncs_to_strip_for_freq = {
 }
 """puncs to be stripped bfr updating word freq dict"""
 
+# rules to filter excessively repeated words of sub groups (see freq_filter.py)
+freq_filter_rules = {
+    "books/religious_amh": {
+        # strip unwanted non-Ethiopic puncs from each word
+        "strip_chars": "()./-",
+        # replace Ethiopic 100-199 representations (do not use ፩ before ፻)
+        "subs": [(r"፩፻", "፻")],
+        "weights": [
+            # freq for single chars
+            {"if": "single_char", "weight": 4},
+            # for (empty) words with only stripped puncs
+            {"if": "empty_word", "weight": 3},
+        ],
+        "threshold": 10,
+    },
+    "enh_corpus_by_year": {
+        # avoid newspaper time stamp footers
+        "skip_line_ptrn": r"^ከ[^0-9]{,20}[0-9]{1,2} ቀን [0-9]{4}$",
+        "weights": [
+            # for arabic numbers
+            {"if_match": r"[0-9]", "weight": 4},
+            # freq for single chars
+            {"if": "single_char", "weight": 15},
+        ],
+        "threshold": 31,
+    },
+    "articles": {
+        # avoid newspaper time stamp footers
+        "skip_line_ptrn": r"^ከ[^0-9]{,20}[0-9]{1,2} ቀን [0-9]{4}$",
+        # skip excessively repeated year tags
+        "skip_ptrn": r"1998|2002",
+        "weights": [
+            # for arabic numbers
+            {"if_match": r"[0-9]", "weight": 4},
+            # freq for single chars
+            {"if": "single_char", "weight": 20},
+        ],
+        "threshold": 51,
+    },
+    "dictionaries_and_word_lists": {
+        # strip unwanted non-Ethiopic puncs from each word
+        "strip_chars": "()./-",
+        "subs": [
+            # remove `-` used to show multiple forms of root words
+            (r"^ተን-([^-]*)$", r"ተን\1"),
+            # replace Ethiopic no.s prefix with common form
+            (r"^ባ(?=[\u1369-\u137C0-9])", "በ"),
+            (r"^ካ(?=[\u1369-\u137C0-9])", "ከ"),
+        ],
+        # skip words with puncs that makes words unusable, and words with
+        # pecuilar Ethiopic lettern & no. comb
+        "skip_ptrn": r"[\.\(\)\-\[\]]|(ድ|ተ|ገ|ቁ)[\u1369-\u137C]+",
+        "weights": [
+            # for single char words, use max of 2 of each form (2*2<5)
+            {"if": "single_char", "weight": 2},
+            # for abbreviations, use only one of each form (1*4<5)
+            {"if_match": r"[\u1200-\u135a]+/[\u1200-\u135a]+", "weight": 4},
+        ],
+        # for the rest store at most 4 of each form (4*1<5)
+        "threshold": 5,
+    },
+}
+"""
+rules to filter words of sub groups (or combined sub groups). Words are stripped
+of `strip_chars`, substituted & skipped if they match `skip_ptrn` (or if their
+line matches `skip_line_ptrn`). The freq of a word (stripped of puncs) is
+increased by the weight of the first matching condition (default 1), and the
+word is kept while its freq is below `threshold`.
+"""
+
 """no. of chars in a single line to be used for training"""
 
 """
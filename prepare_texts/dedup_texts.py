@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Removes near duplicate files & lines from cleaned txt files, like the same
+articles republished (with small changes) in d/t newspapers and years.
+To be run after `clean_up_txt.py` and before combining texts (set input
+root dir of combine scripts to this script's output root dir).
+
+Similarity of two lines is the Jaccard similarity of their sets of char
+shingles (substrings of `shingle_size` chars), estimated using MinHash
+signatures computed in batches with NumPy. Candidate duplicates are found
+using LSH banding (lines sharing all rows of a band of their signatures),
+and dropped if their estimated similarity is at least `jaccard_threshold`.
+The first occurrence is always kept.
+
+Files are deduplicated first (a file's signature is the element-wise min
+of its lines' signatures), then lines of remaining files. Each group (dir in
+input root dir, e.g. all newspapers of articles) is deduplicated separately,
+so texts republished in d/t newspapers or years of a group are compared.
+"""
+
+import json
+import os
+from glob import iglob
+
+import numpy as np
+
+input_root_dir = "./cleaned_texts/"
+output_root_dir = "./deduped_texts"
+info_output_file = "./dedup_info.txt"
+
+# min estimated jaccard similarity of near duplicates
+jaccard_threshold = 0.8
+# no. of chars in a shingle
+shingle_size = 5
+# shorter lines are always kept (too few shingles to compare)
+min_line_length = 20
+# signature length is no_of_bands * rows_per_band. Lines with similarity
+# above (1 / no_of_bands) ** (1 / rows_per_band) are likely candidates.
+no_of_bands = 16
+rows_per_band = 4
+# no. of lines whose signatures are computed at once
+batch_size = 20000
+seed = 23
+
+no_of_perms = no_of_bands * rows_per_band
+rand = np.random.default_rng(seed)
+# odd multipliers to hash shingle chars, and params of MinHash hash functions
+shingle_mults = rand.integers(1, 2**63, shingle_size, dtype=np.uint64) * 2 + 1
+perm_mults = rand.integers(1, 2**63, no_of_perms, dtype=np.uint64) * 2 + 1
+perm_adds = rand.integers(0, 2**63, no_of_perms, dtype=np.uint64)
+band_mults = rand.integers(1, 2**63, rows_per_band, dtype=np.uint64) * 2 + 1
+
+
+def compute_signatures(lines: "list[str]"):
+    """
+    Returns MinHash signatures (`no_of_lines x no_of_perms` array) of lines,
+    computed over their char shingles. Lines must have at least
+    `shingle_size` chars.
+    """
+    # unicode code points of all lines, concatenated
+    code_points = np.frombuffer("".join(lines).encode("utf-32-le"), dtype=np.uint32)
+    line_lens = np.array([len(line) for line in lines], dtype=np.int64)
+    line_starts = np.cumsum(line_lens) - line_lens
+
+    # hash of shingle starting at each position
+    no_of_positions = len(code_points) - shingle_size + 1
+    hashes = np.zeros(no_of_positions, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(shingle_size):
+            hashes += code_points[j : j + no_of_positions] * shingle_mults[j]
+
+    # keep only shingles within a line
+    no_of_shingles = line_lens - shingle_size + 1
+    shingle_starts = np.cumsum(no_of_shingles) - no_of_shingles
+    positions = np.repeat(line_starts - shingle_starts, no_of_shingles) + np.arange(
+        no_of_shingles.sum()
+    )
+    hashes = hashes[positions]
+
+    # min of each hash function over shingles of each line (top 32 bits)
+    signatures = np.empty((len(lines), no_of_perms), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i in range(no_of_perms):
+            perm_hashes = (hashes * perm_mults[i] + perm_adds[i]) >> np.uint64(32)
+            signatures[:, i] = np.minimum.reduceat(perm_hashes, shingle_starts)
+
+    return signatures
+
+
+def find_duplicates(signatures: np.ndarray):
+    """
+    Returns boolean mask of signatures that are near duplicates of
+    an earlier one, using LSH banding.
+
+    In each band, a signature is compared with the first signature
+    having the same band, and marked if their estimated jaccard
+    similarity is at least `jaccard_threshold`.
+    """
+    no_of_sigs = len(signatures)
+    is_duplicate = np.zeros(no_of_sigs, dtype=bool)
+    if no_of_sigs < 2:
+        return is_duplicate
+
+    for b in range(no_of_bands):
+        band = signatures[:, b * rows_per_band : (b + 1) * rows_per_band]
+        with np.errstate(over="ignore"):
+            keys = (band.astype(np.uint64) * band_mults).sum(axis=1)
+
+        # index of first signature with the same band key
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        is_group_start = np.ones(no_of_sigs, dtype=bool)
+        is_group_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        group_firsts = order[is_group_start]
+        firsts = np.empty(no_of_sigs, dtype=np.int64)
+        firsts[order] = group_firsts[np.cumsum(is_group_start) - 1]
+
+        # compare candidates with first in group
+        candidates = np.nonzero((firsts != np.arange(no_of_sigs)) & ~is_duplicate)[0]
+        similarity = (signatures[candidates] == signatures[firsts[candidates]]).mean(
+            axis=1
+        )
+        is_duplicate[candidates[similarity >= jaccard_threshold]] = True
+
+    return is_duplicate
+
+
+def read_lines(file_path: str):
+    """Returns list of stripped lines in file."""
+    with open(file_path) as txt_file:
+        return [line.strip() for line in txt_file]
+
+
+def dedup_group(group_dir: str, written_file_paths: "set[str]"):
+    """
+    Writes files of group to output root dir, without near duplicate
+    files and lines (adding paths of written files to `written_file_paths`).
+    Returns info about removed files & lines.
+    """
+    # first occurrence (in sorted file order) of duplicates is kept
+    pathname = os.path.join(group_dir, "**", "*.txt")
+    file_paths = sorted(iglob(pathname, recursive=True))
+
+    # no. of compared lines in each file
+    file_no_of_lines = np.zeros(len(file_paths), dtype=np.int64)
+    # file signature is min of its lines' signatures (union of shingles)
+    file_signatures = np.full((len(file_paths), no_of_perms), 2**32 - 1, np.uint32)
+    # signatures of lines long enough to compare, computed in batches. Only top
+    # 16 bits are kept to save memory (enough for lines with few shingles).
+    batches: "list[np.ndarray]" = []
+
+    def add_batch(batch: "list[str]", batch_file_ids: "list[int]"):
+        signatures = compute_signatures(batch)
+        file_ids = np.array(batch_file_ids)
+        np.minimum.at(file_signatures, file_ids, signatures)
+        batches.append((signatures >> 16).astype(np.uint16))
+
+    batch: "list[str]" = []
+    batch_file_ids: "list[int]" = []
+    total_no_of_lines = 0
+    for i, file_path in enumerate(file_paths):
+        for line in read_lines(file_path):
+            total_no_of_lines += 1
+            if len(line) < min_line_length:
+                continue
+            batch.append(line)
+            batch_file_ids.append(i)
+            file_no_of_lines[i] += 1
+            if len(batch) == batch_size:
+                add_batch(batch, batch_file_ids)
+                batch, batch_file_ids = [], []
+    if batch:
+        add_batch(batch, batch_file_ids)
+
+    signatures = (
+        np.concatenate(batches) if batches else np.empty((0, no_of_perms), np.uint16)
+    )
+    file_starts = np.cumsum(file_no_of_lines) - file_no_of_lines
+
+    has_lines = file_no_of_lines > 0
+    is_duplicate_file = np.zeros(len(file_paths), dtype=bool)
+    is_duplicate_file[has_lines] = find_duplicates(file_signatures[has_lines])
+
+    # dedup lines of remaining files only
+    line_is_kept = np.repeat(~is_duplicate_file, file_no_of_lines)
+    is_duplicate_line = np.zeros(len(signatures), dtype=bool)
+    is_duplicate_line[line_is_kept] = find_duplicates(signatures[line_is_kept])
+
+    # write remaining files & lines to output dir
+    removed_lines = 0
+    for i, file_path in enumerate(file_paths):
+        lines = read_lines(file_path)
+        if is_duplicate_file[i]:
+            removed_lines += len(lines)
+            continue
+
+        output_file_path = os.path.join(
+            output_root_dir, os.path.relpath(file_path, input_root_dir)
+        )
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        written_file_paths.add(output_file_path)
+
+        j = file_starts[i]  # index of file's next compared line
+        with open(output_file_path, "w") as output_file:
+            for line in lines:
+                if len(line) >= min_line_length:
+                    j += 1
+                    if is_duplicate_line[j - 1]:
+                        removed_lines += 1
+                        continue
+                output_file.write(line + "\n")
+
+    return {
+        "no_of_files": len(file_paths),
+        "removed_files": int(is_duplicate_file.sum()),
+        "no_of_lines": total_no_of_lines,
+        "removed_lines": removed_lines,
+    }
+
+
+if __name__ == "__main__":
+    assert min_line_length >= shingle_size, "Lines Shorter than a Shingle!"
+
+    group_dirs = sorted(iglob(os.path.join(input_root_dir, "*", "")))
+    if len(group_dirs) == 0:
+        print(f"No files in given directory: {input_root_dir}")
+        exit(1)
+
+    info_dict: "dict[str, dict[str, int]]" = {}
+    """{group_dir: {'info_name': 'value'}}"""
+    written_file_paths: "set[str]" = set()
+    for group_dir in group_dirs:
+        info = dedup_group(group_dir, written_file_paths)
+        info_dict[group_dir] = info
+        print(
+            f"{group_dir}: removed {info['removed_lines']} of "
+            f"{info['no_of_lines']} lines ({info['removed_files']} files)"
+        )
+
+    # remove outputs of earlier runs not written (input deleted or duplicate)
+    pathname = os.path.join(output_root_dir, "**", "*.txt")
+    for output_file_path in iglob(pathname, recursive=True):
+        if output_file_path not in written_file_paths:
+            os.remove(output_file_path)
+
+    with open(info_output_file, "w") as file:
+        json.dump(info_dict, file, indent=2, ensure_ascii=False)
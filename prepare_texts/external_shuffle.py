@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Seeded shuffle of words that don't fit in memory, used by the combine scripts.
+"""
+
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Iterable
+
+import numpy as np
+
+
+class ExternalShuffler:
+    """
+    Shuffles words using temp files on disk and bounded memory.
+
+    Each added word is written to one of `no_of_buckets` temp files (bucket)
+    chosen at random. When iterated, buckets are read one at a time, shuffled
+    in memory and their words yielded. A bucket too large to be shuffled in
+    memory is itself shuffled externally.
+
+    Words must not contain newlines. For the same seed & words added the same
+    way, words are always yielded in the same order.
+    """
+
+    # approx. memory used by a word in a python list, per byte in file
+    memory_per_byte = 8
+    # no. of added words assigned to buckets at once
+    batch_size = 65536
+    # large buckets are shuffled in memory after this many nested shuffles
+    max_depth = 3
+
+    def __init__(
+        self,
+        seed: int,
+        max_memory_mb: float = 512,
+        no_of_buckets: int = 64,
+        tmp_dir: "str | None" = None,
+        depth: int = 0,
+    ):
+        self.seed = seed
+        self.depth = depth
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        self.no_of_buckets = no_of_buckets
+        self.tmp_dir = tempfile.mkdtemp(prefix="shuffle-", dir=tmp_dir)
+        # removes temp files when closed, or at exit if not closed (on errors)
+        self.finalizer = weakref.finalize(
+            self, shutil.rmtree, self.tmp_dir, ignore_errors=True
+        )
+        self.bucket_file_paths = [
+            os.path.join(self.tmp_dir, f"bucket-{i}") for i in range(no_of_buckets)
+        ]
+        self.rand = np.random.default_rng(seed)
+        # words added but not yet assigned to buckets
+        self.pending: "list[str]" = []
+        # words assigned but not yet written to bucket files
+        self.buffers: "list[list[str]]" = [[] for _ in range(no_of_buckets)]
+        self.buffered_chars = 0
+        self.no_of_words = 0
+
+    def __len__(self):
+        return self.no_of_words
+
+    def append(self, word: str):
+        """Adds a word to be shuffled."""
+        self.extend([word])
+
+    def extend(self, words: "Iterable[str]"):
+        """Adds words to be shuffled."""
+        no_of_pending = len(self.pending)
+        self.pending.extend(words)
+        self.no_of_words += len(self.pending) - no_of_pending
+
+        # assign in batches of fixed size, so order doesn't depend on how
+        # words are added
+        if len(self.pending) >= self.batch_size:
+            size = len(self.pending) // self.batch_size * self.batch_size
+            for i in range(0, size, self.batch_size):
+                self.assign(self.pending[i : i + self.batch_size])
+            del self.pending[:size]
+
+    def assign(self, words: "list[str]"):
+        """Adds words to random buckets."""
+        bucket_ids = self.rand.integers(self.no_of_buckets, size=len(words))
+        for word, bucket_id in zip(words, bucket_ids.tolist()):
+            self.buffers[bucket_id].append(word)
+            self.buffered_chars += len(word) + 1
+
+        if self.buffered_chars * self.memory_per_byte > self.max_memory // 2:
+            self.flush()
+
+    def flush(self):
+        """Writes buffered words to their bucket files."""
+        for bucket_file_path, buffer in zip(self.bucket_file_paths, self.buffers):
+            if buffer:
+                with open(bucket_file_path, "a") as bucket_file:
+                    bucket_file.write("\n".join(buffer) + "\n")
+                buffer.clear()
+        self.buffered_chars = 0
+
+    def __iter__(self):
+        """Yields added words in shuffled order."""
+        if self.pending:
+            self.assign(self.pending)
+            self.pending = []
+        self.flush()
+        # seeds of bucket shuffles, same for each iteration
+        bucket_seeds = np.random.default_rng(self.seed + 1).integers(
+            2**32, size=self.no_of_buckets
+        )
+        for bucket_file_path, bucket_seed in zip(self.bucket_file_paths, bucket_seeds):
+            if not os.path.isfile(bucket_file_path):
+                continue
+            size = os.path.getsize(bucket_file_path)
+            if (
+                size * self.memory_per_byte <= self.max_memory
+                or self.depth >= self.max_depth
+            ):
+                yield from self.shuffle_bucket(bucket_file_path, int(bucket_seed))
+            else:
+                yield from self.shuffle_large_bucket(bucket_file_path, int(bucket_seed))
+
+    def shuffle_bucket(self, bucket_file_path: str, seed: int):
+        """Returns words in bucket file shuffled in memory."""
+        with open(bucket_file_path) as bucket_file:
+            words = bucket_file.read().split("\n")[:-1]
+        np.random.default_rng(seed).shuffle(words)
+
+        return words
+
+    def shuffle_large_bucket(self, bucket_file_path: str, seed: int):
+        """Yields words in bucket file shuffled externally."""
+        shuffler = ExternalShuffler(
+            seed,
+            self.max_memory / 1024 / 1024,
+            self.no_of_buckets,
+            self.tmp_dir,
+            self.depth + 1,
+        )
+        with open(bucket_file_path) as bucket_file:
+            while True:
+                lines = bucket_file.readlines(self.batch_size * 16)
+                if not lines:
+                    break
+                shuffler.extend(line[:-1] for line in lines)
+
+        yield from shuffler
+        shuffler.close()
+
+    def close(self):
+        """Removes temp files."""
+        self.finalizer()
+
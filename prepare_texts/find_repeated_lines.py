@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Finds lines repeated excessively in each group of cleaned txt files (like
+adverts & common articles in newspapers, across all newspapers & years of a
+group), and writes them to a file of lines to be skipped by `clean_up_txt.py`.
+
+Lines are counted in a streaming pass using bounded memory, and lines that
+may be repeated enough are then counted exactly in a second pass. As cleaned
+txts no longer contain lines skipped on earlier runs, new repeated lines are
+added to the lines already in the file (remove lines from the file by hand).
+"""
+
+import json
+import os
+from glob import iglob
+
+from stream_counters import SpaceSaving
+
+# root dir of cleaned txts (contains dirs only)
+cleaned_txts_root_dir = "./cleaned_texts/"
+
+# output file of lines to skip (one per line) & info about them
+lines_to_skip_file_path = "./lines_to_skip.txt"
+info_output_file = "./repeated_lines_info.txt"
+
+# max no. of distinct lines counted at a time for each group. If `None`, set
+# from size of group so that no line repeated `min_repeats` times is missed.
+top_k = None
+# min no. of times a line is repeated in a group to be skipped
+min_repeats = 50
+# shorter lines are not skipped (like chapter titles in books)
+min_line_length = 20
+
+
+def iter_lines(file_paths: "list[str]"):
+    """Yields stripped lines (long enough to be skipped) of files."""
+    for file_path in file_paths:
+        with open(file_path) as txt_file:
+            for line in txt_file:
+                line = line.strip()
+                if len(line) >= min_line_length:
+                    yield line
+
+
+def find_repeated_lines(group_dir: str):
+    """
+    Returns `{line: count}` of lines repeated at least `min_repeats` times in
+    all txt files of group dir, most repeated first.
+    """
+    pathname = os.path.join(group_dir, "**", "*.txt")
+    file_paths = sorted(iglob(pathname, recursive=True))
+
+    # lines seen more than `n / k` times are kept by counter, and there are at
+    # most `size / min_line_length` counted lines (of at least a byte a char)
+    k = top_k
+    if k is None:
+        size = sum(os.path.getsize(file_path) for file_path in file_paths)
+        k = size // (min_line_length * min_repeats) + 1
+
+    counter = SpaceSaving(k)
+    for line in iter_lines(file_paths):
+        counter.add(line)
+
+    # count candidates (over estimated counts) exactly
+    counts = {
+        line: 0 for line, count, _ in counter.most_common() if count >= min_repeats
+    }
+    del counter
+    for line in iter_lines(file_paths):
+        if line in counts:
+            counts[line] += 1
+
+    repeated_lines = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+
+    return {line: count for line, count in repeated_lines if count >= min_repeats}
+
+
+if __name__ == "__main__":
+    group_dirs = sorted(iglob(os.path.join(cleaned_txts_root_dir, "*", "")))
+    if len(group_dirs) == 0:
+        print(f"No files in given directory: {cleaned_txts_root_dir}")
+        exit(1)
+
+    # keep lines found on earlier runs (skipped, so not counted again)
+    lines_to_skip: "set[str]" = set()
+    if os.path.isfile(lines_to_skip_file_path):
+        with open(lines_to_skip_file_path) as skip_file:
+            lines_to_skip.update(
+                line.strip() for line in skip_file if not line.isspace()
+            )
+    no_of_old_lines = len(lines_to_skip)
+    info_dict: "dict[str, list[dict]]" = {}
+    """{group_dir: [{'line': line, 'count': count}]}"""
+
+    for group_dir in group_dirs:
+        repeated_lines = find_repeated_lines(group_dir)
+
+        info_dict[group_dir] = [
+            {"line": line, "count": count} for line, count in repeated_lines.items()
+        ]
+        lines_to_skip.update(repeated_lines)
+        print(f"{group_dir}: {len(repeated_lines)} repeated lines")
+
+    print(f"{len(lines_to_skip) - no_of_old_lines} new lines to skip")
+    with open(lines_to_skip_file_path, "w") as output_file:
+        output_file.writelines(line + "\n" for line in sorted(lines_to_skip))
+
+    with open(info_output_file, "w") as file:
+        json.dump(info_dict, file, indent=2, ensure_ascii=False)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Filters excessively repeated words of a sub group using frequency caps,
+with rules declared in `constants.freq_filter_rules`.
+"""
+
+import re
+from typing import Iterable
+
+from constants import puncs_to_strip_for_freq
+from stream_counters import CountMinSketch
+
+# conditions that can be used (with `if`) in weights of rules
+conditions = {
+    "single_char": lambda w, key: len(key) == 1,
+    "empty_word": lambda w, key: w == "",
+}
+
+
+def get_match_condition(ptrn: str):
+    """Returns condition met by words whose key (stripped word) matches pattern."""
+    search = re.compile(ptrn).search
+
+    return lambda w, key: search(key) is not None
+
+
+class FreqFilter:
+    """
+    Filters words using a rule of `constants.freq_filter_rules`. Freq of words
+    is kept across calls, so words of all files of a sub group (in order) are
+    filtered by the same filter.
+
+    If `sketch_width` is given, freqs are counted approximately, using bounded
+    memory (a count-min sketch, which may over estimate freqs and so filter
+    a few more words).
+    """
+
+    def __init__(self, rule: dict, sketch_width: "int | None" = None):
+        self.strip_chars: str = rule.get("strip_chars", "")
+        self.subs = [(re.compile(p), repl) for p, repl in rule.get("subs", [])]
+        self.skip_ptrn = re.compile(rule["skip_ptrn"]) if "skip_ptrn" in rule else None
+        self.skip_line_ptrn = (
+            re.compile(rule["skip_line_ptrn"]) if "skip_line_ptrn" in rule else None
+        )
+        self.threshold: int = rule["threshold"]
+        self.key_strip_chars = "".join(puncs_to_strip_for_freq)
+
+        # `(condition(w, key), weight)` of each weight, checked in order
+        self.weights = []
+        for weight in rule.get("weights", []):
+            if "if" in weight:
+                condition = conditions[weight["if"]]
+            else:
+                condition = get_match_condition(weight["if_match"])
+            self.weights.append((condition, weight["weight"]))
+
+        self.freqs: "dict[str, int]" = {}
+        self.sketch = CountMinSketch(sketch_width) if sketch_width else None
+
+    def get_weight(self, w: str, key: str):
+        """Returns weight of first matching condition (1 if none matches)."""
+        for condition, weight in self.weights:
+            if condition(w, key):
+                return weight
+
+        return 1
+
+    def prepare(self, words: "Iterable[str]"):
+        """
+        Returns lists of words (substituted & stripped) not skipped, their keys
+        (words stripped of puncs) and weights. Doesn't change freqs, so words
+        can be prepared in parallel (and applied in order).
+        """
+        strip_chars, key_strip_chars = self.strip_chars, self.key_strip_chars
+        subs, skip_ptrn = self.subs, self.skip_ptrn
+
+        prepared_wrds: "list[str]" = []
+        keys: "list[str]" = []
+        weights: "list[int]" = []
+        for w in words:
+            if strip_chars:
+                w = w.strip(strip_chars)
+            for ptrn, repl in subs:
+                w = ptrn.sub(repl, w)
+            if skip_ptrn is not None and skip_ptrn.search(w):
+                continue
+
+            key = w.strip(key_strip_chars)
+            prepared_wrds.append(w)
+            keys.append(key)
+            weights.append(self.get_weight(w, key))
+
+        return prepared_wrds, keys, weights
+
+    def apply(self, words: "list[str]", keys: "list[str]", weights: "list[int]"):
+        """
+        Updates freqs with prepared words (in order), and returns list of
+        words below freq threshold.
+        """
+        threshold, freqs, sketch = self.threshold, self.freqs, self.sketch
+
+        filtered_wrds: "list[str]" = []
+        for w, key, weight in zip(words, keys, weights):
+            if sketch is None:
+                freq = freqs[key] = freqs.get(key, 0) + weight
+            else:
+                freq = sketch.add(key, weight)
+
+            # if word is below freq threshold add to list
+            if freq < threshold:
+                filtered_wrds.append(w)
+
+        return filtered_wrds
+
+    def filter(self, words: "Iterable[str]"):
+        """Returns list of words (substituted & stripped) below freq threshold."""
+        return self.apply(*self.prepare(words))
+
+    def prepare_lines(self, lines: "Iterable[str]"):
+        """Prepares words in lines, skipping lines matching `skip_line_ptrn`."""
+        words: "list[str]" = []
+        for line in lines:
+            line = line.strip()
+            if self.skip_line_ptrn is not None and self.skip_line_ptrn.search(line):
+                continue
+            words.extend(line.split())
+
+        return self.prepare(words)
+
+    def filter_lines(self, lines: "Iterable[str]"):
+        """
+        Returns list of words in lines below freq threshold, skipping lines
+        matching `skip_line_ptrn`. All words are filtered in one batch.
+        """
+        return self.apply(*self.prepare_lines(lines))
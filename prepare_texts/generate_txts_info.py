@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
 """
 Generate aggreagate information about Cleaned txt files
+
+Stats of each file (no. of words, lines, chars & line lengths) are cached in
+a sidecar index keyed by path, size & mtime, so only new or changed files are
+read (in parallel) on each run, and are then summed by group & sub group.
 """
 
 import json
 import os
+from collections import Counter
 from glob import iglob
+from multiprocessing import Pool
 from pathlib import Path
 from statistics import mean
 
+import numpy as np
+
+from byte_stats import get_byte_stats, whitespace_code_points
 from constants import LINE_LENGTH
+from tokenized_corpus import TokenizedCorpus
 
 # output file to write info to
 info_ouput_file = "./cleaned_txt_files_info.txt"
@@ -17,112 +27,290 @@ info_ouput_file = "./cleaned_txt_files_info.txt"
 # root dir of cleaned txts (contains dirs only)
 cleaned_txts_root_dir = "./cleaned_texts/"
 
+# cache of stats of each file (by path, size & mtime). If `None`, stats of all
+# files are computed on each run.
+stats_cache_file = "./cleaned_txt_files_stats_cache.json"
+
+# no. of processes used to compute stats of new or changed files
+NO_OF_WORKERS = os.cpu_count() or 1
+
+# pre-tokenised corpus of cleaned txts to count words from (see
+# tokenized_corpus.py). If `None`, words are counted from txt files.
+tokenized_corpus_dir = None
+
 # names used as keys for info
 info_names = [
     "total_size",
     "total_no_of_files",
+    "total_no_of_lines",
     "total_no_of_wrds",
     "total_len_of_wrds",
     "avg_len_of_wrds",
     "no_of_trimmed_lines",
 ]
 
-# use list of dirs in root dir as groups of txts
-group_path = os.path.join(cleaned_txts_root_dir, "*", "")
-group_dirs = list(iglob(group_path, recursive=False))
-
-if len(group_dirs) == 0:
-    print(f'No files in given directory: {cleaned_txts_root_dir}')
-    exit(1)
-
-# dict to store info about each group and its sub groups
-info_dict: "dict[str, dict[str, dict[str, float|int]]]" = {}
-"""{'group_path': {sub_group_path: {'info_name': 'value'}}}"""
-
-for group_dir in group_dirs:
-    # to match sub dirs
-    sub_group_path = group_dir + "/*/"
-    sub_group_dirs = list(iglob(sub_group_path, recursive=False))
-
-    if len(sub_group_dirs) == 0:  # no sub groups
-        sub_group_dirs.append(group_dir)
-
-    group_dict: "dict[str, dict[str, float|int]]" = {}
-    """{sub_group_path: {'info_name': 'value'}}"""
-    for sub_group_dir in sub_group_dirs:
-        sub_group_dict = {}
-        # all txt files in sub group dir
-        pathname = os.path.join(sub_group_dir, "**", "*.txt")
-
-        total_size, total_no_of_files, total_no_of_wrds, total_len_of_wrds = 0, 0, 0, 0
-
-        for file_path in iglob(pathname, recursive=True):
-            total_size += os.stat(file_path).st_size / 1024 / 1024
-            total_no_of_files += 1
-            with open(file_path) as txt_file:
-                for line in txt_file:
-                    wrds = line.split()
-                    total_no_of_wrds += len(wrds)
-                    total_len_of_wrds += sum([len(w) for w in wrds])
-
-        avg_len_of_wrds = round(total_len_of_wrds / total_no_of_wrds, 2)
-        sub_group_dict["total_no_of_files"] = total_no_of_files
-        sub_group_dict["total_size"] = round(total_size, 3)
-        sub_group_dict["total_no_of_wrds"] = total_no_of_wrds
-        sub_group_dict["total_len_of_wrds"] = total_len_of_wrds
-        sub_group_dict["avg_len_of_wrds"] = avg_len_of_wrds
-
-        # approximate estimation (one space aftr each wrd)
-        no_of_wrds_per_line = LINE_LENGTH // (avg_len_of_wrds + 1)
-        sub_group_dict["no_of_trimmed_lines"] = round(
-            total_no_of_wrds / no_of_wrds_per_line
-        )
+# names of histograms in info (summed over files, sub groups & groups)
+histogram_names = [
+    "char_counts",  # no. of each (non space) char
+    "line_len_counts",  # no. of lines of each length (words joined by a space)
+]
+
+
+def get_nonzero_counts(counts: np.ndarray):
+    """Returns Counter of indices of non zero counts of bincount."""
+    indices = np.flatnonzero(counts)
+
+    return Counter(dict(zip(indices.tolist(), counts[indices].tolist())))
+
+
+def get_file_stats(file_path: str):
+    """
+    Returns no. of lines & words, length of words, and histograms of file
+    (counted from its bytes, see byte_stats.py).
+    """
+    byte_stats = get_byte_stats(file_path)
+
+    # counts of non whitespace chars
+    code_point_counts = byte_stats["code_point_counts"]
+    is_whitespace = np.isin(np.arange(len(code_point_counts)), whitespace_code_points)
+    code_point_counts[is_whitespace] = 0
+    char_counts = Counter(
+        {chr(c): n for c, n in get_nonzero_counts(code_point_counts).items()}
+    )
+
+    return get_stats_dict(
+        byte_stats["no_of_lines"],
+        byte_stats["no_of_wrds"],
+        byte_stats["len_of_wrds"],
+        char_counts,
+        get_nonzero_counts(byte_stats["line_len_counts"]),
+    )
+
+
+def get_corpus_file_stats(corpus: TokenizedCorpus, file_path: str):
+    """Returns stats of file (as `get_file_stats`) from tokenized corpus."""
+    file_index = corpus.get_file_index(file_path)
+    ids = np.asarray(corpus.get_file_ids(file_index))
+    word_lens = corpus.word_lens[ids]
+
+    # chars of each word of file, times no. of occurrences of word
+    char_counts: "Counter[str]" = Counter()
+    id_counts = np.bincount(ids, minlength=len(corpus.vocab))
+    for i in np.flatnonzero(id_counts).tolist():
+        for ch, n in Counter(corpus.vocab[i]).items():
+            char_counts[ch] += n * int(id_counts[i])
+
+    # length of each line from no. of words & their total length
+    first_line, end_line = corpus.file_offsets[file_index : file_index + 2]
+    offsets = np.asarray(corpus.line_offsets[first_line : end_line + 1])
+    offsets = offsets - offsets[0]
+    len_sums = np.concatenate([[0], np.cumsum(word_lens)])
+    line_wrd_counts = np.diff(offsets)
+    line_lens = np.maximum(np.diff(len_sums[offsets]) + line_wrd_counts - 1, 0)
+    lengths, counts = np.unique(line_lens, return_counts=True)
+
+    return get_stats_dict(
+        len(line_wrd_counts),
+        len(ids),
+        int(word_lens.sum()),
+        char_counts,
+        Counter(dict(zip(lengths.tolist(), counts.tolist()))),
+    )
+
+
+def get_stats_dict(
+    no_of_lines: int,
+    no_of_wrds: int,
+    len_of_wrds: int,
+    char_counts: "Counter[str]",
+    line_len_counts: "Counter[int]",
+):
+    """Returns stats of a file as a dict (JSON serializable)."""
+    return {
+        "no_of_lines": no_of_lines,
+        "no_of_wrds": no_of_wrds,
+        "len_of_wrds": len_of_wrds,
+        "char_counts": dict(char_counts.most_common()),
+        "line_len_counts": {str(k): v for k, v in sorted(line_len_counts.items())},
+    }
+
+
+def load_stats_cache(cache_file: "str | None"):
+    """Returns cached `{path: {size, mtime, stats}}` (empty if no cache)."""
+    if cache_file is None or not os.path.isfile(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def get_all_file_stats(file_paths: "list[str]", corpus: "TokenizedCorpus | None"):
+    """
+    Returns stats of each file, using cached stats of files whose size &
+    mtime are unchanged. Stats of other files are computed (in parallel) and
+    cached.
+    """
+    cache = load_stats_cache(stats_cache_file)
+
+    new_cache: "dict[str, dict]" = {}
+    stale_paths: "list[str]" = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        entry = cache.get(file_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            new_cache[file_path] = entry
+        else:
+            new_cache[file_path] = {"size": stat.st_size, "mtime": stat.st_mtime}
+            stale_paths.append(file_path)
+
+    print(f"Computing stats of {len(stale_paths)} of {len(file_paths)} files")
+    if corpus is not None:
+        stale_stats = [get_corpus_file_stats(corpus, path) for path in stale_paths]
+    elif NO_OF_WORKERS > 1 and len(stale_paths) > 1:
+        with Pool(NO_OF_WORKERS) as pool:
+            stale_stats = pool.map(get_file_stats, stale_paths, chunksize=1)
+    else:
+        stale_stats = [get_file_stats(path) for path in stale_paths]
+
+    for file_path, stats in zip(stale_paths, stale_stats):
+        new_cache[file_path]["stats"] = stats
 
-        # add sub group dict to group dict
-        group_dict[sub_group_dir] = sub_group_dict
+    if stats_cache_file is not None:
+        with open(stats_cache_file, "w") as f:
+            json.dump(new_cache, f, ensure_ascii=False)
 
-    # add group dict to info dict
-    info_dict[group_dir] = group_dict
+    return new_cache
 
-# summary of info for each group (summed/averaged over sub groups)
-group_summary_dict = {}
-"""{'group_path': {'info_name': 'value'}}"""
-for g, sg_dict in info_dict.items():
-    g_dict = {}
-    sub_groups = sg_dict.keys()
+
+def sum_histograms(histograms: "list[dict]", sort_by_key: bool = False):
+    """Returns sum of histograms (sorted by count, or by key if numeric)."""
+    total: "Counter" = Counter()
+    for histogram in histograms:
+        total.update(histogram)
+
+    if sort_by_key:
+        return {k: total[k] for k in sorted(total, key=int)}
+
+    return dict(total.most_common())
+
+
+def sum_info(dicts: "list[dict]"):
+    """Returns info summed (or averaged) over info dicts (of sub groups/groups)."""
+    summed = {}
     for info_name in info_names:
         if info_name == "avg_len_of_wrds":
-            g_dict[info_name] = round(
-                mean([sg_dict[sg][info_name] for sg in sub_groups]), 3
-            )
+            summed[info_name] = round(mean([d[info_name] for d in dicts]), 3)
         else:
-            g_dict[info_name] = round(
-                sum([sg_dict[sg][info_name] for sg in sub_groups]), 3
+            summed[info_name] = round(sum([d[info_name] for d in dicts]), 3)
+    for name in histogram_names:
+        summed[name] = sum_histograms(
+            [d[name] for d in dicts], sort_by_key=name == "line_len_counts"
+        )
+
+    return summed
+
+
+if __name__ == "__main__":
+    # use list of dirs in root dir as groups of txts
+    group_path = os.path.join(cleaned_txts_root_dir, "*", "")
+    group_dirs = list(iglob(group_path, recursive=False))
+
+    if len(group_dirs) == 0:
+        print(f'No files in given directory: {cleaned_txts_root_dir}')
+        exit(1)
+
+    corpus = None
+    if tokenized_corpus_dir is not None:
+        corpus = TokenizedCorpus(tokenized_corpus_dir)
+        if not corpus.is_up_to_date():
+            print(f'Tokenized corpus "{tokenized_corpus_dir}" is out of date!')
+            exit(1)
+
+    # txt files of each sub group dir of each group dir
+    group_files: "dict[str, dict[str, list[str]]]" = {}
+    for group_dir in group_dirs:
+        # to match sub dirs
+        sub_group_path = group_dir + "/*/"
+        sub_group_dirs = list(iglob(sub_group_path, recursive=False))
+
+        if len(sub_group_dirs) == 0:  # no sub groups
+            sub_group_dirs.append(group_dir)
+
+        group_files[group_dir] = {}
+        for sub_group_dir in sub_group_dirs:
+            # all txt files in sub group dir
+            pathname = os.path.join(sub_group_dir, "**", "*.txt")
+            group_files[group_dir][sub_group_dir] = list(
+                iglob(pathname, recursive=True)
             )
 
-    group_summary_dict[g] = g_dict
+    all_file_paths = [
+        path for sg_files in group_files.values() for paths in sg_files.values()
+        for path in paths
+    ]
+    file_stats = get_all_file_stats(all_file_paths, corpus)
 
+    # dict to store info about each group and its sub groups
+    info_dict: "dict[str, dict[str, dict]]" = {}
+    """{'group_path': {sub_group_path: {'info_name': 'value'}}}"""
 
-# summary info for all files (summed/averaged over groups)
-summary_dict = {}
-"""{'info_name': 'value'}"""
-for k in info_names:
-    if k == "avg_len_of_wrds":
-        summary_dict[k] = round(mean([g[k] for g in group_summary_dict.values()]), 3)
-    else:
-        summary_dict[k] = round(sum([g[k] for g in group_summary_dict.values()]), 3)
-
-# add no chars per line to output file name
-output_file_path = Path(info_ouput_file)
-output_file_path = output_file_path.with_name(
-    output_file_path.stem + f"_{LINE_LENGTH}_chars_line" + output_file_path.suffix
-)
-
-# write to output file
-with open(output_file_path, "w") as file:
-    json.dump("ALL FILES SUMMARY", file)
-    json.dump(summary_dict, file, indent=2)
-    json.dump("GROUP SUMMARY", file)
-    json.dump(group_summary_dict, file, indent=2)
-    json.dump("SUB-GROUPS SUMMARY", file)
-    json.dump(info_dict, file, indent=2)
+    for group_dir, sg_files in group_files.items():
+        group_dict: "dict[str, dict]" = {}
+        """{sub_group_path: {'info_name': 'value'}}"""
+        for sub_group_dir, file_paths in sg_files.items():
+            sub_group_dict = {}
+
+            entries = [file_stats[path] for path in file_paths]
+            stats = [entry["stats"] for entry in entries]
+            total_size = sum(entry["size"] for entry in entries) / 1024 / 1024
+            total_no_of_wrds = sum(s["no_of_wrds"] for s in stats)
+            total_len_of_wrds = sum(s["len_of_wrds"] for s in stats)
+
+            avg_len_of_wrds = round(total_len_of_wrds / total_no_of_wrds, 2)
+            sub_group_dict["total_no_of_files"] = len(file_paths)
+            sub_group_dict["total_size"] = round(total_size, 3)
+            sub_group_dict["total_no_of_lines"] = sum(s["no_of_lines"] for s in stats)
+            sub_group_dict["total_no_of_wrds"] = total_no_of_wrds
+            sub_group_dict["total_len_of_wrds"] = total_len_of_wrds
+            sub_group_dict["avg_len_of_wrds"] = avg_len_of_wrds
+
+            # approximate estimation (one space aftr each wrd)
+            no_of_wrds_per_line = LINE_LENGTH // (avg_len_of_wrds + 1)
+            sub_group_dict["no_of_trimmed_lines"] = round(
+                total_no_of_wrds / no_of_wrds_per_line
+            )
+
+            sub_group_dict["char_counts"] = sum_histograms(
+                [s["char_counts"] for s in stats]
+            )
+            sub_group_dict["line_len_counts"] = sum_histograms(
+                [s["line_len_counts"] for s in stats], sort_by_key=True
+            )
+
+            # add sub group dict to group dict
+            group_dict[sub_group_dir] = sub_group_dict
+
+        # add group dict to info dict
+        info_dict[group_dir] = group_dict
+
+    # summary of info for each group (summed/averaged over sub groups)
+    group_summary_dict = {g: sum_info(list(sg.values())) for g, sg in info_dict.items()}
+    """{'group_path': {'info_name': 'value'}}"""
+
+    # summary info for all files (summed/averaged over groups)
+    summary_dict = sum_info(list(group_summary_dict.values()))
+    """{'info_name': 'value'}"""
+
+    # add no chars per line to output file name
+    output_file_path = Path(info_ouput_file)
+    output_file_path = output_file_path.with_name(
+        output_file_path.stem + f"_{LINE_LENGTH}_chars_line" + output_file_path.suffix
+    )
+
+    # write to output file
+    with open(output_file_path, "w") as file:
+        json.dump("ALL FILES SUMMARY", file)
+        json.dump(summary_dict, file, indent=2, ensure_ascii=False)
+        json.dump("GROUP SUMMARY", file)
+        json.dump(group_summary_dict, file, indent=2, ensure_ascii=False)
+        json.dump("SUB-GROUPS SUMMARY", file)
+        json.dump(info_dict, file, indent=2, ensure_ascii=False)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Packs (shuffled) words into lines of training text, used by the combine scripts.
+
+Words are packed a batch at a time. Line breaks of a batch are found at once,
+using prefix sums of word lengths (a line is at most `line_length - 1` chars
+with a space after each word).
+"""
+
+from collections import deque
+from itertools import islice
+from typing import IO, Iterable
+
+import numpy as np
+
+# no. of words packed at a time
+batch_size = 65536
+
+
+def get_next_line_starts(word_lens: np.ndarray, line_length: int):
+    """
+    Returns index of the word starting the next line, for a line starting at
+    each word. Words are added to a line while they fit (line with a space
+    after each word is shorter than `line_length`), and a word that doesn't
+    fit in an empty line is put in a line of its own.
+    """
+    ends = np.cumsum(word_lens + 1)
+    starts = ends - (word_lens + 1)
+    next_starts = np.searchsorted(ends, starts + line_length, side="right")
+
+    return np.maximum(next_starts, np.arange(1, len(word_lens) + 1))
+
+
+def get_greedy_lines(words: "list[str]", line_length: int, is_last: bool):
+    """
+    Returns lines of words packed in order, and words of the last (possibly
+    not full) line, to be packed with the next batch unless `is_last` is set.
+    """
+    word_lens = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    next_starts = get_next_line_starts(word_lens, line_length).tolist()
+
+    lines: "list[str]" = []
+    start = 0
+    while start < len(words):
+        end = next_starts[start]
+        if end == len(words) and not is_last:
+            break
+        lines.append(" ".join(words[start:end]).strip())
+        start = end
+
+    return lines, words[start:]
+
+
+def get_best_fit_lines(words: "list[str]", line_length: int, is_last: bool):
+    """
+    Returns lines of words packed to fill lines closer to `line_length`, and
+    words left to be packed with the next batch unless `is_last` is set.
+
+    Each line is started with the earliest unused word, and then filled with
+    the longest (earliest) unused word that fits, until no word fits.
+    """
+    word_lens = [len(w) for w in words]
+    max_len = max(word_lens, default=0)
+    # indices of unused words of each length, in order
+    buckets: "list[deque[int]]" = [deque() for _ in range(max_len + 1)]
+    for i, word_len in enumerate(word_lens):
+        buckets[word_len].append(i)
+
+    is_used = [False] * len(words)
+    # keep enough words to fill lines with, unless there are no more words
+    min_unused = 0 if is_last else len(words) // 8
+    no_of_unused = len(words)
+
+    lines: "list[str]" = []
+    start = 0
+    while no_of_unused > min_unused:
+        while is_used[start]:
+            start += 1
+        buckets[word_lens[start]].popleft()
+        is_used[start] = True
+        line_wrds = [words[start]]
+        line_len = word_lens[start] + 1  # with a space after each word
+
+        # longest word that fits in rest of line
+        word_len = min(line_length - 1 - line_len, max_len)
+        while word_len >= 0:
+            if buckets[word_len]:
+                i = buckets[word_len].popleft()
+                is_used[i] = True
+                line_wrds.append(words[i])
+                line_len += word_len + 1
+                word_len = min(line_length - 1 - line_len, word_len)
+            else:
+                word_len -= 1
+
+        no_of_unused -= len(line_wrds)
+        lines.append(" ".join(line_wrds).strip())
+
+    unused_words = [w for w, used in zip(words, is_used) if not used]
+
+    return lines, unused_words
+
+
+def pack_batches_multi(
+    words: "Iterable[str]",
+    line_lengths: "list[int]",
+    best_fit: bool = False,
+):
+    """
+    Yields lists of lines (without newlines) of packed words for each line
+    length, a batch at a time. Words are read once, and packed for each line
+    length separately. Empty and space only lines are skipped.
+    """
+    get_lines = get_best_fit_lines if best_fit else get_greedy_lines
+    words = iter(words)
+    # words left (not packed) from previous batch, for each line length
+    left_words: "list[list[str]]" = [[] for _ in line_lengths]
+    while True:
+        new_words = list(islice(words, batch_size))
+        is_last = len(new_words) < batch_size
+        batches: "list[list[str]]" = []
+        for i, line_length in enumerate(line_lengths):
+            lines, left_words[i] = get_lines(
+                left_words[i] + new_words, line_length, is_last
+            )
+            batches.append([line for line in lines if line])
+        yield batches
+        if is_last:
+            break
+
+
+def pack_batches(words: "Iterable[str]", line_length: int, best_fit: bool = False):
+    """
+    Yields lists of lines (without newlines) of packed words, a batch at
+    a time. Empty and space only lines are skipped.
+    """
+    for batches in pack_batches_multi(words, [line_length], best_fit):
+        yield batches[0]
+
+
+def pack_words(words: "Iterable[str]", line_length: int, best_fit: bool = False):
+    """Yields lines (without newlines) of packed words."""
+    for lines in pack_batches(words, line_length, best_fit):
+        yield from lines
+
+
+def write_packed_words(
+    output_file: IO[str],
+    words: "Iterable[str]",
+    line_length: int,
+    best_fit: bool = False,
+):
+    """Packs words into lines & writes them to output file, a batch at a time."""
+    for lines in pack_batches(words, line_length, best_fit):
+        if lines:
+            output_file.write("\n".join(lines) + "\n")
+
+
+def write_packed_words_multi(
+    output_files: "list[IO[str]]",
+    words: "Iterable[str]",
+    line_lengths: "list[int]",
+    best_fit: bool = False,
+):
+    """
+    Packs words into lines of each line length & writes them to the output
+    file of the line length, a batch at a time (words are read once).
+    """
+    for batches in pack_batches_multi(words, line_lengths, best_fit):
+        for output_file, lines in zip(output_files, batches):
+            if lines:
+                output_file.write("\n".join(lines) + "\n")
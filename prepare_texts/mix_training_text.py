@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Mixes lines of sub group files (output of the combine scripts) into a training
+text of given no. of lines, with share of each sub group set by weights.
+
+Lines are streamed: each sub group gets a quota of lines (by weight), and
+lines are drawn from sub groups in random order until their quotas are
+filled. A sub group file is read only up to its quota, and closed as soon as
+the quota is filled. Since lines of sub group files are already shuffled, the
+first lines of a file are a random sample of it.
+"""
+
+import os
+
+import numpy as np
+
+OVERWRITE = True
+
+# no. of lines of mixed training text
+TARGET_LINE_COUNT = 200000
+
+# to read a sub group file again from the start if it has fewer lines than its
+# quota (repeated sub groups are printed). If `False`, its missing lines are
+# not filled (fewer lines are written).
+REPEAT_SOURCES = False
+
+# seed of order lines are drawn from sub groups
+SEED = 23
+
+# no. of lines drawn & written at a time
+batch_size = 65536
+
+# contains one txt file for each subgroup
+input_root_dir = "./combined_txts"
+
+output_root_dir = "."
+output_file_name = "amh-layer.mixed.training_txt"
+
+# weight of each sub group file (share of its lines in mixed text)
+sub_group_weights = {
+    "articles": 40,
+    "books_religious_amh": 30,
+    "enh_corpus_by_year": 30,
+    "dictionaries_and_word_lists": 0,
+}
+
+
+def get_quotas(weights: "list[float]", target_line_count: int):
+    """
+    Returns no. of lines of each sub group, proportional to weights and
+    summing to target line count (remainders go to largest fractions).
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    shares = weights / weights.sum() * target_line_count
+    quotas = np.floor(shares).astype(np.int64)
+    remainder = target_line_count - quotas.sum()
+    quotas[np.argsort(quotas - shares, kind="stable")[:remainder]] += 1
+
+    return quotas
+
+
+def iter_source_lines(file_path: str, repeat: bool, line_counts: "dict[str, int]"):
+    """
+    Yields non empty lines (stripped) of file, from start again when the end
+    is reached if `repeat` is set. File is closed when generator is closed.
+    No. of lines of file is added to `line_counts` when its end is reached.
+    """
+    while True:
+        no_of_lines = 0
+        with open(file_path) as txt_file:
+            for line in txt_file:
+                line = line.strip()
+                if line:
+                    no_of_lines += 1
+                    yield line
+
+        line_counts[file_path] = no_of_lines
+        if not repeat or no_of_lines == 0:
+            print(f'"{file_path}" ran out of lines')
+            return
+        print(f'"{file_path}" ran out of lines, reading again from start')
+
+
+def mix_lines(
+    file_paths: "list[str]",
+    quotas: np.ndarray,
+    repeat: bool,
+    seed: int,
+    line_counts: "dict[str, int]",
+):
+    """
+    Yields lists of lines drawn from files in random order, a batch at a
+    time, until quota of each file is filled (or its lines run out). No. of
+    lines of files read to the end are added to `line_counts`.
+    """
+    # source index of each line, in order lines are drawn
+    draws = np.random.default_rng(seed).permutation(
+        np.repeat(np.arange(len(file_paths)), quotas)
+    )
+    sources = [iter_source_lines(path, repeat, line_counts) for path in file_paths]
+    remaining = quotas.tolist()
+
+    for start in range(0, len(draws), batch_size):
+        lines: "list[str]" = []
+        for i in draws[start : start + batch_size].tolist():
+            line = next(sources[i], None)
+            if line is not None:
+                lines.append(line)
+            remaining[i] -= 1
+            # stop reading source once its quota is filled
+            if remaining[i] == 0:
+                sources[i].close()
+        yield lines
+
+
+if __name__ == "__main__":
+    # set output file path
+    output_file_path = os.path.join(output_root_dir, output_file_name)
+
+    # check if output file already exists
+    if not OVERWRITE and os.path.exists(output_file_path):
+        response = input(f"File {output_file_path} Exists. Overwrite? Y/N: ")
+        if response != "Y":
+            exit(1)
+
+    # sub groups with a weight (& their file)
+    sub_groups = [sub_grp for sub_grp, w in sub_group_weights.items() if w > 0]
+    file_paths = [os.path.join(input_root_dir, sub_grp) for sub_grp in sub_groups]
+    for file_path in file_paths:
+        if not os.path.isfile(file_path):
+            print(f'Sub group file "{file_path}" not found')
+            exit(1)
+
+    quotas = get_quotas([sub_group_weights[s] for s in sub_groups], TARGET_LINE_COUNT)
+
+    # no. of lines of sub group files read to the end
+    line_counts: "dict[str, int]" = {}
+
+    no_of_lines = 0
+    with open(output_file_path, "w") as output_file:
+        for lines in mix_lines(file_paths, quotas, REPEAT_SOURCES, SEED, line_counts):
+            if lines:
+                output_file.write("\n".join(lines) + "\n")
+            no_of_lines += len(lines)
+
+    for sub_grp, file_path, quota in zip(sub_groups, file_paths, quotas.tolist()):
+        line_count = line_counts.get(file_path)
+        if line_count is None or quota <= line_count:
+            print(f"{sub_grp}: {quota} lines")
+        elif REPEAT_SOURCES and line_count > 0:
+            print(
+                f"{sub_grp}: {quota} lines, REPEATED {quota / line_count:.2f} "
+                f"times ({line_count} lines)"
+            )
+        else:
+            print(f"{sub_grp}: {line_count} of {quota} lines")
+    print(f'Wrote {no_of_lines} lines to "{output_file_path}"')
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Plans freq thresholds (& weights) of `constants.freq_filter_rules` without
+re-running the combine scripts.
+
+Words of each sub group are prepared (substituted, stripped & skipped) once,
+into a histogram of no. of occurrences of each key (word stripped of puncs)
+by weight condition. Since the freq of a key only grows by its weight, the
+no. of its words kept for threshold `T` & weight `w` is `min(n, (T - 1) // w)`,
+so no. of words, chars & lines (and unique chars) kept for any thresholds are
+found in milliseconds. Thresholds hitting a target no. of lines are found by
+binary search.
+
+Counts are estimates: chars of kept words are found using average length of
+words of a key, and lines using average chars per line (found by packing
+sampled words). Words of the same key with d/t weights (e.g. empty words) are
+counted as d/t keys.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from glob import iglob
+
+import numpy as np
+
+from constants import LINE_LENGTH, freq_filter_rules
+from freq_filter import FreqFilter
+from line_packer import get_next_line_starts
+from tokenized_corpus import get_files_meta
+
+# root dir of cleaned txts, and dir of histograms of sub groups (built if
+# missing or if files or rule of sub group changed)
+input_root_dir = "./cleaned_texts"
+histograms_dir = "./freq_histograms"
+
+# dirs in input root dir of each sub group (with a rule in freq_filter_rules)
+sub_group_dirs = {
+    "books/religious_amh": ["books/religious_amh"],
+    "enh_corpus_by_year": ["enh_corpus_by_year"],
+    "articles": ["articles"],
+    "dictionaries_and_word_lists": ["word_lists", "dictionary_and_linguistic_books"],
+}
+
+# thresholds of sub groups to query (missing sub groups use thresholds of rules)
+what_if_thresholds: "list[dict[str, int]]" = [
+    {"enh_corpus_by_year": 21, "articles": 31},
+    {"enh_corpus_by_year": 41, "articles": 71},
+]
+
+# to find thresholds (scaled from thresholds of rules) giving this no. of lines
+# for all sub groups. If `None`, thresholds are not solved for.
+TARGET_LINE_COUNT = None
+
+# no. of words packed to find average chars per line
+sample_size = 100000
+
+
+class FreqHistogram:
+    """
+    No. of words of each key of a sub group by weight condition (index of
+    condition in `weights` of rule, after the default weight of 1), and chars
+    found in words of each condition.
+    """
+
+    def __init__(
+        self,
+        rule: dict,
+        counts: np.ndarray,
+        condition_ids: np.ndarray,
+        char_lens: np.ndarray,
+        chars: str,
+        char_masks: np.ndarray,
+    ):
+        self.threshold: int = rule["threshold"]
+        # weight of each condition (default weight first)
+        self.weights = [1] + [weight["weight"] for weight in rule.get("weights", [])]
+        # no. of words, condition & total length of words, of each key
+        self.counts = counts
+        self.condition_ids = condition_ids
+        self.char_lens = char_lens
+        # conditions (bit mask) of words each char is found in
+        self.chars = chars
+        self.char_masks = char_masks
+        self._chars_per_line: "float | None" = None
+
+    @classmethod
+    def build(cls, rule: dict, file_paths: "list[str]"):
+        """Returns histogram of words in files, prepared by filter of rule."""
+        freq_filter = FreqFilter(rule)
+        conditions = [condition for condition, _ in freq_filter.weights]
+
+        # no. of occurrences of each prepared word (& its key)
+        word_counts: "Counter[tuple[str, str]]" = Counter()
+        for file_path in file_paths:
+            with open(file_path) as txt_file:
+                words, keys, _ = freq_filter.prepare_lines(txt_file)
+            word_counts.update(zip(words, keys))
+
+        # aggregate words by key & condition
+        groups: "dict[tuple[str, int], list[int]]" = {}
+        char_masks: "dict[str, int]" = {}
+        for (w, key), n in word_counts.items():
+            condition_id = next(
+                (i + 1 for i, cond in enumerate(conditions) if cond(w, key)), 0
+            )
+            group = groups.setdefault((key, condition_id), [0, 0])
+            group[0] += n
+            group[1] += n * len(w)
+            for ch in set(w):
+                char_masks[ch] = char_masks.get(ch, 0) | 1 << condition_id
+
+        values = np.array(list(groups.values()), dtype=np.int64).reshape(-1, 2)
+        condition_ids = np.array([i for _, i in groups], dtype=np.int8)
+
+        return cls(
+            rule,
+            values[:, 0],
+            condition_ids,
+            values[:, 1],
+            "".join(char_masks),
+            np.array(list(char_masks.values()), dtype=np.int64),
+        )
+
+    def save(self, file_path: str):
+        """Saves histogram as npz file."""
+        np.savez(
+            file_path,
+            counts=self.counts,
+            condition_ids=self.condition_ids,
+            char_lens=self.char_lens,
+            chars=np.frombuffer(self.chars.encode("utf-32-le"), dtype=np.uint32),
+            char_masks=self.char_masks,
+        )
+
+    @classmethod
+    def load(cls, rule: dict, file_path: str):
+        """Loads histogram saved as npz file (weights & threshold from rule)."""
+        with np.load(file_path) as data:
+            return cls(
+                rule,
+                data["counts"],
+                data["condition_ids"],
+                data["char_lens"],
+                data["chars"].tobytes().decode("utf-32-le"),
+                data["char_masks"],
+            )
+
+    def get_kept_counts(self, threshold: int, weights: "list[int] | None" = None):
+        """Returns no. of words kept of each key, for threshold & weights."""
+        weights = np.asarray(self.weights if weights is None else weights)
+
+        return np.minimum(self.counts, (threshold - 1) // weights[self.condition_ids])
+
+    def get_chars_per_line(self):
+        """
+        Returns average no. of chars (with spaces) per line, found by packing
+        words of sampled lengths (for threshold of rule).
+        """
+        if self._chars_per_line is None:
+            kept = self.get_kept_counts(self.threshold)
+            if kept.sum() == 0:
+                return LINE_LENGTH
+            avg_lens = np.rint(self.char_lens / np.maximum(self.counts, 1))
+            rng = np.random.default_rng(23)
+            word_lens = rng.choice(
+                avg_lens.astype(np.int64), size=sample_size, p=kept / kept.sum()
+            )
+            next_starts = get_next_line_starts(word_lens, LINE_LENGTH).tolist()
+            no_of_lines, start = 0, 0
+            while start < len(word_lens):
+                start = next_starts[start]
+                no_of_lines += 1
+            self._chars_per_line = (word_lens.sum() + len(word_lens)) / no_of_lines
+
+        return self._chars_per_line
+
+    def query(self, threshold: int, weights: "list[int] | None" = None):
+        """
+        Returns no. of words, chars & lines (estimates), and unique chars,
+        kept for threshold & weights.
+        """
+        weights = self.weights if weights is None else weights
+        kept = self.get_kept_counts(threshold, weights)
+        no_of_chars = float(
+            (kept * self.char_lens / np.maximum(self.counts, 1)).sum()
+        )
+        # chars in words of a condition with at least one word kept
+        kept_mask = sum(1 << i for i, w in enumerate(weights) if w < threshold)
+        has_char = (self.char_masks & kept_mask) != 0
+
+        return {
+            "words": int(kept.sum()),
+            "chars": round(no_of_chars),
+            "lines": round((no_of_chars + kept.sum()) / self.get_chars_per_line()),
+            "unique_chars": int(has_char.sum()),
+            "lost_chars": "".join(
+                ch for ch, has in zip(self.chars, has_char.tolist()) if not has
+            ),
+        }
+
+
+def get_sub_group_files(sub_grp: str):
+    """Returns sorted list of txt files in dirs of sub group."""
+    file_paths: "list[str]" = []
+    for sub_dir in sub_group_dirs[sub_grp]:
+        pathname = os.path.join(input_root_dir, sub_dir, "**", "*.txt")
+        file_paths.extend(iglob(pathname, recursive=True))
+
+    return sorted(file_paths)
+
+
+def load_histograms():
+    """
+    Returns histogram of each sub group, building (& saving) those missing or
+    whose files or rule changed since built.
+    """
+    if not os.path.isdir(histograms_dir):
+        os.mkdir(histograms_dir)
+
+    histograms: "dict[str, FreqHistogram]" = {}
+    for sub_grp, rule in freq_filter_rules.items():
+        base_path = os.path.join(histograms_dir, sub_grp.replace("/", "_"))
+        file_paths = get_sub_group_files(sub_grp)
+        # files & rule (except threshold, given at query) histogram is built from
+        meta = {
+            "files": get_files_meta(input_root_dir, file_paths),
+            "rule": json.loads(
+                json.dumps({k: v for k, v in rule.items() if k != "threshold"})
+            ),
+        }
+
+        meta_file_path = base_path + ".json"
+        if os.path.isfile(meta_file_path):
+            with open(meta_file_path) as meta_file:
+                if json.load(meta_file) == meta:
+                    histograms[sub_grp] = FreqHistogram.load(rule, base_path + ".npz")
+                    continue
+
+        print(f"Building histogram of {sub_grp} ({len(file_paths)} files)")
+        histograms[sub_grp] = FreqHistogram.build(rule, file_paths)
+        histograms[sub_grp].save(base_path + ".npz")
+        with open(meta_file_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+
+    return histograms
+
+
+def query_all(histograms: "dict[str, FreqHistogram]", thresholds: "dict[str, int]"):
+    """Returns query result of each sub group, and total no. of lines."""
+    results = {
+        sub_grp: hist.query(thresholds.get(sub_grp, hist.threshold))
+        for sub_grp, hist in histograms.items()
+    }
+
+    return results, sum(result["lines"] for result in results.values())
+
+
+def solve_thresholds(histograms: "dict[str, FreqHistogram]", target_line_count: int):
+    """
+    Returns thresholds (of rules, all scaled by the same factor) giving no.
+    of lines closest to target, found by binary search on the scale factor.
+    """
+
+    def get_thresholds(scale: float):
+        return {
+            sub_grp: max(1, round(hist.threshold * scale))
+            for sub_grp, hist in histograms.items()
+        }
+
+    low, high = 0.0, 1.0
+    # double scale until target is reached (or all words are kept)
+    while True:
+        results, total = query_all(histograms, get_thresholds(high))
+        if total >= target_line_count or all(
+            results[sub_grp]["words"] == hist.counts.sum()
+            for sub_grp, hist in histograms.items()
+        ):
+            break
+        high *= 2
+
+    for _ in range(50):
+        mid = (low + high) / 2
+        if query_all(histograms, get_thresholds(mid))[1] < target_line_count:
+            low = mid
+        else:
+            high = mid
+
+    return get_thresholds(high)
+
+
+def print_results(title: str, thresholds: "dict[str, int]", results: dict, total: int):
+    """Prints query results of sub groups."""
+    print(f"\n{title}")
+    for sub_grp, result in results.items():
+        lost_chars = result["lost_chars"]
+        if len(lost_chars) > 40:
+            lost_chars = f"{lost_chars[:40]}... ({len(lost_chars)} chars)"
+        print(
+            f"  {sub_grp} (threshold {thresholds[sub_grp]}): {result['lines']} lines, "
+            f"{result['words']} words, {result['unique_chars']} unique chars"
+            + (f", lost: {lost_chars}" if lost_chars else "")
+        )
+    print(f"  total: {total} lines")
+
+
+if __name__ == "__main__":
+    histograms = load_histograms()
+    rule_thresholds = {sub_grp: h.threshold for sub_grp, h in histograms.items()}
+
+    queries = [("Thresholds of rules", rule_thresholds)] + [
+        (f"What if {thresholds}", {**rule_thresholds, **thresholds})
+        for thresholds in what_if_thresholds
+    ]
+    for title, thresholds in queries:
+        start = time.perf_counter()
+        results, total = query_all(histograms, thresholds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print_results(f"{title} ({elapsed_ms:.1f} ms)", thresholds, results, total)
+
+    if TARGET_LINE_COUNT is not None:
+        thresholds = solve_thresholds(histograms, TARGET_LINE_COUNT)
+        results, total = query_all(histograms, thresholds)
+        print_results(
+            f"Solved for {TARGET_LINE_COUNT} lines", thresholds, results, total
+        )
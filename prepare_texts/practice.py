@@ -6,7 +6,14 @@ Testing Ground for cleaning txt files
 """
 import json
 import os
+import random
+import re
+import zlib
+from collections import Counter
 from glob import iglob
+from multiprocessing import Pool
+
+from stream_counters import ReservoirSample
 
 non_eth_chars = {
     # minus, en & em dashes (rep: minus-hiphen(-))
@@ -70,6 +77,15 @@ eth_puncs_avoid = {0x135d, 0x135e, 0x135f, 0x1360, 0x1367, 0x1368}
 # output file to write info to
 info_ouput_file = './txt_info_all.txt'
 
+# to audit with bounded memory: keep exact count and a random sample of (at
+# most `audit_sample_size`) words of each char of each file, instead of all
+# words. Results of each file are streamed (as JSON lines) to audit output file.
+AUDIT_MODE = False
+audit_ouput_file = './txt_audit_all.jsonl'
+audit_sample_size = 20
+# no. of processes used to audit files
+NO_OF_WORKERS = os.cpu_count() or 1
+
 # root dir of  txts (contains dirs only)
 txts_root_dir = './cleaned_texts/'
 
@@ -77,76 +93,154 @@ txts_root_dir = './cleaned_texts/'
 group_path = os.path.join(txts_root_dir, '*', '')
 group_dirs = list(iglob(group_path, recursive=False))
 
-# dict to store info about each group and its sub groups
-info_dict: 'dict[str, dict[str,  dict[str, dict[str, list[str]]]]]' = {}
-"""{'group_path': {sub_group_path: {file: {'char': list['words']}}}}"""
-
-
-for group_dir in group_dirs:
-
-    # to match sub dirs
-    sub_group_path = group_dir + '/*/'
-    sub_group_dirs = list(iglob(sub_group_path, recursive=False))
-
-    if len(sub_group_dirs) == 0:    # no sub groups
-        sub_group_dirs.append(group_dir)
-
-    group_dict: 'dict[str,  dict[str, dict[str, list[str]]]]' = {}
-    """{sub_group_path: {file: {'char': list['words']}}}"""
-    for sub_group_dir in sub_group_dirs:
-        sub_group_dict: 'dict[str, dict[str, list[str]]]' = {}
-        # all txt files in sub group dir
-        pathname = os.path.join(sub_group_dir, '**', '*.txt')
-
-        for file_path in iglob(pathname, recursive=True):
-            file_dict: 'dict[str, list[str]]' = {}
-            """{file: {'char': list['words']}}"""
-            with open(file_path) as in_file:
-                for line in in_file:
-                    if line.isspace() or line == '':
-                        continue
-                    words = line.split()
-                    for w in words:
-                        # if not any([ord(c) in eth_unicode_range_all for c in w]):
-                        #     continue
-                        for c in w:
-                            # if not (ord(c) in eth_unicode_range_all or c in non_eth_chars):
-                            #     continue
-                            if (c in allowed_non_eth_chars) or\
-                                (ord(c) in eth_unicode_range_all and not (ord(c) in eth_puncs_avoid or ord(c) in eth_letters_avoid)):
-                                continue
-                            if c not in file_dict:
-                                file_dict[c] = []
-                            file_dict[c].append(w)
-
-            if file_dict == {}:
-                continue
-            sub_group_dict[file_path] = file_dict
 
-        group_dict[sub_group_dir] = sub_group_dict
+# chars not reported (allowed non Ethiopic & Ethiopic chars not avoided)
+allowed_chars = allowed_non_eth_chars | {
+    chr(c) for c in eth_unicode_range_all
+    if not (c in eth_puncs_avoid or c in eth_letters_avoid)
+}
+not_allowed_ptrn = re.compile(
+    '[^' + ''.join(re.escape(c) for c in sorted(allowed_chars)) + ']'
+)
+
+
+def audit_file(file_path: str):
+    """
+    Returns `{'char': {'count': int, 'samples': list['words']}}` of chars
+    not allowed, with no. of words (per char in word) & random sample words.
+    """
+    # seeded by path, for the same samples on each run
+    rand = random.Random(zlib.crc32(file_path.encode()))
+    samples: 'dict[str, ReservoirSample]' = {}
+    with open(file_path) as in_file:
+        for line in in_file:
+            # skip lines with allowed chars only
+            if not not_allowed_ptrn.search(line):
+                continue
+            for w in line.split():
+                for c in not_allowed_ptrn.findall(w):
+                    if c not in samples:
+                        samples[c] = ReservoirSample(audit_sample_size, rand)
+                    samples[c].add(w)
+
+    return {c: {'count': s.count, 'samples': s.items} for c, s in samples.items()}
+
+
+def write_audit(group_dirs: 'list[str]', out_file):
+    """
+    Audits files of all groups (in parallel, in order) & writes a JSON line
+    `{'group', 'sub_group', 'file', 'chars'}` for each file with chars not
+    allowed, and a last line `{'total_counts': {'char': int}}`.
+    """
+    # (group, sub group, file) of each txt file
+    file_keys: 'list[tuple[str, str, str]]' = []
+    for group_dir in group_dirs:
+        sub_group_dirs = list(iglob(group_dir + '/*/', recursive=False))
+        if len(sub_group_dirs) == 0:    # no sub groups
+            sub_group_dirs.append(group_dir)
+
+        for sub_group_dir in sub_group_dirs:
+            pathname = os.path.join(sub_group_dir, '**', '*.txt')
+            for file_path in iglob(pathname, recursive=True):
+                file_keys.append((group_dir, sub_group_dir, file_path))
+
+    total_counts: 'Counter[str]' = Counter()
+    with Pool(NO_OF_WORKERS) as pool:
+        file_paths = [file_path for _, _, file_path in file_keys]
+        results = pool.imap(audit_file, file_paths)
+        for (group_dir, sub_group_dir, file_path), chars in zip(file_keys, results):
+            if chars == {}:
+                continue
+            total_counts.update({c: info['count'] for c, info in chars.items()})
+            out_file.write(json.dumps(
+                {'group': group_dir, 'sub_group': sub_group_dir,
+                 'file': file_path, 'chars': chars},
+                ensure_ascii=False,
+            ) + '\n')
+
+    out_file.write(json.dumps(
+        {'total_counts': dict(total_counts.most_common())}, ensure_ascii=False
+    ) + '\n')
+
+
+if __name__ == '__main__' and AUDIT_MODE:
+    with open(audit_ouput_file, 'w') as out_file:
+        write_audit(group_dirs, out_file)
+
+elif __name__ == '__main__':
+    # dict to store info about each group and its sub groups
+    info_dict: 'dict[str, dict[str,  dict[str, dict[str, list[str]]]]]' = {}
+    """{'group_path': {sub_group_path: {file: {'char': list['words']}}}}"""
+
+
+    for group_dir in group_dirs:
+
+        # to match sub dirs
+        sub_group_path = group_dir + '/*/'
+        sub_group_dirs = list(iglob(sub_group_path, recursive=False))
+
+        if len(sub_group_dirs) == 0:    # no sub groups
+            sub_group_dirs.append(group_dir)
+
+        group_dict: 'dict[str,  dict[str, dict[str, list[str]]]]' = {}
+        """{sub_group_path: {file: {'char': list['words']}}}"""
+        for sub_group_dir in sub_group_dirs:
+            sub_group_dict: 'dict[str, dict[str, list[str]]]' = {}
+            # all txt files in sub group dir
+            pathname = os.path.join(sub_group_dir, '**', '*.txt')
+
+            for file_path in iglob(pathname, recursive=True):
+                file_dict: 'dict[str, list[str]]' = {}
+                """{file: {'char': list['words']}}"""
+                with open(file_path) as in_file:
+                    for line in in_file:
+                        if line.isspace() or line == '':
+                            continue
+                        words = line.split()
+                        for w in words:
+                            # if not any([ord(c) in eth_unicode_range_all for c in w]):
+                            #     continue
+                            for c in w:
+                                # if not (ord(c) in eth_unicode_range_all or c in non_eth_chars):
+                                #     continue
+                                if (c in allowed_non_eth_chars) or\
+                                    (ord(c) in eth_unicode_range_all and not (ord(c) in eth_puncs_avoid or ord(c) in eth_letters_avoid)):
+                                    continue
+                                if c not in file_dict:
+                                    file_dict[c] = []
+                                file_dict[c].append(w)
+
+                if file_dict == {}:
+                    continue
+                sub_group_dict[file_path] = file_dict
+
+            group_dict[sub_group_dir] = sub_group_dict
+
+        info_dict[group_dir] = group_dict
+
+    # write to output file
+    with open(info_ouput_file, 'w') as file:
+        json.dump(info_dict, file, indent=2, ensure_ascii=False)
+
+    input_sub_groups = {    # sub dirs in root dir (no / at start)
+    'word_lists', 'dictionary_and_linguistic_books', 'articles',
+    'books/religious_amh/', 'books/religious_geez/', 'enh_corpus_by_year',
+    }
+    # with open('./txt_test_info.txt') as file:
+    #     info = json.load(file)
+    out = {}
+    out['word_lists'] = info_dict["./cleaned_texts/word_lists/"]
+    out['dictionaries'] = info_dict["./cleaned_texts/dictionary_and_linguistic_books/"]
+    out['articles'] = info_dict["./cleaned_texts/articles/"]
+    out['books/religious_amh/'] = info_dict["./cleaned_texts/books/"]["./cleaned_texts/books/religious_amh/"]
+    out['books/religious_geez/'] = info_dict["./cleaned_texts/books/"]["./cleaned_texts/books/religious_geez/"]
+    out['enh_corpus'] = info_dict["./cleaned_texts/enh_corpus_by_year/"]
+
+    with open('./selected_info_all.txt', 'w') as file:
+        json.dump(out, file, indent=2, ensure_ascii=False)
 
-    info_dict[group_dir] = group_dict
 
-# write to output file
-with open(info_ouput_file, 'w') as file:
-    json.dump(info_dict, file, indent=2, ensure_ascii=False)
 
-input_sub_groups = {    # sub dirs in root dir (no / at start)
-'word_lists', 'dictionary_and_linguistic_books', 'articles',
-'books/religious_amh/', 'books/religious_geez/', 'enh_corpus_by_year',
-}
-# with open('./txt_test_info.txt') as file:
-#     info = json.load(file)
-out = {}
-out['word_lists'] = info_dict["./cleaned_texts/word_lists/"]
-out['dictionaries'] = info_dict["./cleaned_texts/dictionary_and_linguistic_books/"]
-out['articles'] = info_dict["./cleaned_texts/articles/"]
-out['books/religious_amh/'] = info_dict["./cleaned_texts/books/"]["./cleaned_texts/books/religious_amh/"]
-out['books/religious_geez/'] = info_dict["./cleaned_texts/books/"]["./cleaned_texts/books/religious_geez/"]
-out['enh_corpus'] = info_dict["./cleaned_texts/enh_corpus_by_year/"]
-
-with open('./selected_info_all.txt', 'w') as file:
-    json.dump(out, file, indent=2, ensure_ascii=False)
 
 
 
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Counters that use bounded memory to count items in large streams
+(lines or words of a corpus).
+"""
+
+import heapq
+import random
+import zlib
+from array import array
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k counter. Keeps counts of at most `k` items.
+
+    When a new item is seen and counter is full, the item with the least
+    count is replaced, and the new item gets its count plus one. Count of
+    an item is thus over estimated by at most its `error`. Any item seen
+    more than `n / k` times in a stream of `n` items is guaranteed to be kept.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.counts: "dict[str, int]" = {}
+        self.errors: "dict[str, int]" = {}
+        # (count, item) entries, some may be stale (count updated since)
+        self.heap: "list[tuple[int, str]]" = []
+
+    def add(self, item: str):
+        """Counts one occurrence of item."""
+        count = self.counts.get(item)
+        if count is not None:
+            self.counts[item] = count + 1
+        elif len(self.counts) < self.k:
+            self.counts[item] = 1
+            self.errors[item] = 0
+        else:
+            # replace item with least count
+            min_count, min_item = self.pop_min()
+            del self.counts[min_item], self.errors[min_item]
+            self.counts[item] = min_count + 1
+            self.errors[item] = min_count
+
+        heapq.heappush(self.heap, (self.counts[item], item))
+
+        # remove stale entries if heap grows too large
+        if len(self.heap) > 8 * self.k:
+            self.heap = [(c, i) for i, c in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def pop_min(self):
+        """Removes & returns `(count, item)` of the item with least count."""
+        while True:
+            count, item = heapq.heappop(self.heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def most_common(self, min_count: int = 0):
+        """
+        Returns list of `(item, count, error)` sorted by count, of items
+        whose guaranteed count (count - error) is at least `min_count`.
+        """
+        items = [
+            (item, count, self.errors[item])
+            for item, count in self.counts.items()
+            if count - self.errors[item] >= min_count
+        ]
+        items.sort(key=lambda x: x[1], reverse=True)
+
+        return items
+
+
+class CountMinSketch:
+    """
+    Count-min sketch with conservative update. Estimates counts of items
+    using `depth` rows of `width` counters, each item mapped to one counter
+    in each row. Counts are never under estimated, and over estimated by
+    at most about `2 * total count / width` with high probability.
+    """
+
+    def __init__(self, width: int, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def get_indices(self, item: str):
+        """Returns index of item's counter in each row (double hashing)."""
+        data = item.encode()
+        h1 = zlib.crc32(data)
+        h2 = zlib.crc32(data, 0x9E3779B9) | 1
+
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item: str, count: int = 1):
+        """Adds count of item, and returns its new estimated count."""
+        indices = self.get_indices(item)
+        new_count = min(row[i] for row, i in zip(self.rows, indices)) + count
+        # only increase counters below new count (conservative update)
+        for row, i in zip(self.rows, indices):
+            if row[i] < new_count:
+                row[i] = new_count
+
+        return new_count
+
+    def get(self, item: str):
+        """Returns estimated count of item."""
+        return min(row[i] for row, i in zip(self.rows, self.get_indices(item)))
+
+
+class ReservoirSample:
+    """
+    Uniform random sample of at most `k` items of a stream (reservoir
+    sampling). Each item seen so far is in the sample with probability
+    `k / count`.
+    """
+
+    def __init__(self, k: int, rand: "random.Random | None" = None):
+        self.k = k
+        self.rand = rand or random.Random()
+        self.count = 0
+        self.items: "list[str]" = []
+
+    def add(self, item: str):
+        """Counts item, and keeps it in sample with probability `k / count`."""
+        self.count += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+        else:
+            i = self.rand.randrange(self.count)
+            if i < self.k:
+                self.items[i] = item
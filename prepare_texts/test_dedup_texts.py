@@ -0,0 +1,58 @@
+"""
+Tests of near duplicate removal of `dedup_texts.py` (run with pytest from
+prepare_texts dir).
+"""
+
+import os
+import random
+
+import dedup_texts
+
+# distinct lines of random words of Ethiopic letters
+rand = random.Random(23)
+lines = [
+    " ".join(
+        "".join(chr(rand.randrange(0x1200, 0x1358)) for _ in range(rand.randint(2, 6)))
+        for _ in range(10)
+    )
+    for _ in range(200)
+]
+
+
+def write_file(file_path: str, file_lines: "list[str]"):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as txt_file:
+        txt_file.writelines(line + "\n" for line in file_lines)
+
+
+def dedup(tmp_path, monkeypatch):
+    input_root_dir = str(tmp_path / "cleaned_texts")
+    monkeypatch.setattr(dedup_texts, "input_root_dir", input_root_dir)
+    monkeypatch.setattr(dedup_texts, "output_root_dir", str(tmp_path / "deduped"))
+
+    return dedup_texts.dedup_group(os.path.join(input_root_dir, "articles"), set())
+
+
+def test_copy_in_other_dir_of_group_is_removed(tmp_path, monkeypatch):
+    # same article in two newspapers (dirs) of a group
+    write_file(str(tmp_path / "cleaned_texts/articles/a/f0.txt"), lines[:100])
+    write_file(str(tmp_path / "cleaned_texts/articles/b/f0.txt"), lines[:100])
+    write_file(str(tmp_path / "cleaned_texts/articles/b/f1.txt"), lines[100:])
+
+    info = dedup(tmp_path, monkeypatch)
+
+    assert info["removed_files"] == 1
+    assert info["removed_lines"] == 100
+    assert os.path.isfile(tmp_path / "deduped/articles/a/f0.txt")
+    assert not os.path.exists(tmp_path / "deduped/articles/b/f0.txt")
+
+
+def test_lines_repeated_in_other_dir_are_removed(tmp_path, monkeypatch):
+    # a few lines of an article reprinted in another newspaper
+    write_file(str(tmp_path / "cleaned_texts/articles/a/f0.txt"), lines[:100])
+    write_file(str(tmp_path / "cleaned_texts/articles/b/f0.txt"), lines[90:190])
+
+    info = dedup(tmp_path, monkeypatch)
+
+    assert info["removed_files"] == 0
+    assert info["removed_lines"] == 10
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Pre-tokenised corpus of cleaned txt files: a vocabulary of words and memory
+mapped arrays of word ids, so that downstream scripts don't re-read & split
+the same txt files.
+
+Files in corpus dir:
+    vocab.txt           words, one per line (line index is word id)
+    ids.npy             uint32 ids of words in all lines of all files
+    line_offsets.npy    index in ids of first word of each line (& of end)
+    file_offsets.npy    index of first line of each file (& of end)
+    meta.json           paths (relative to source root dir), sizes & mtimes
+                        of tokenised files
+
+Run as a script (or set `tokenized_corpus_dir` in `clean_up_txt.py`)
+to build the corpus of cleaned txt files.
+"""
+
+import json
+import os
+from array import array
+from glob import iglob
+
+import numpy as np
+
+# root dir of txt files to tokenise, and output dir of corpus
+source_root_dir = "./cleaned_texts/"
+corpus_dir = "./tokenized_texts"
+
+
+def get_source_files(source_root_dir: str):
+    """Returns sorted list of all txt files in source root dir."""
+    pathname = os.path.join(source_root_dir, "**", "*.txt")
+
+    return sorted(iglob(pathname, recursive=True))
+
+
+def get_files_meta(source_root_dir: str, file_paths: "list[str]"):
+    """Returns list of path (relative to source root dir), size & mtime of files."""
+    files_meta = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        files_meta.append(
+            {
+                "path": os.path.relpath(file_path, source_root_dir),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+        )
+
+    return files_meta
+
+
+def is_up_to_date(source_root_dir: str, corpus_dir: str):
+    """
+    Returns True if corpus exists and source files are the same (path, size &
+    mtime) as when it was built.
+    """
+    meta_file_path = os.path.join(corpus_dir, "meta.json")
+    if not os.path.isfile(meta_file_path):
+        return False
+
+    with open(meta_file_path) as meta_file:
+        files_meta = json.load(meta_file)["files"]
+    file_paths = get_source_files(source_root_dir)
+
+    return get_files_meta(source_root_dir, file_paths) == files_meta
+
+
+def build_corpus(source_root_dir: str, corpus_dir: str):
+    """Tokenises all txt files in source root dir & writes corpus to corpus dir."""
+    file_paths = get_source_files(source_root_dir)
+
+    vocab: "dict[str, int]" = {}
+    ids = array("I")
+    line_offsets = array("q", [0])
+    file_offsets = array("q", [0])
+
+    for file_path in file_paths:
+        with open(file_path) as txt_file:
+            for line in txt_file:
+                for w in line.split():
+                    word_id = vocab.get(w)
+                    if word_id is None:
+                        word_id = vocab[w] = len(vocab)
+                    ids.append(word_id)
+                line_offsets.append(len(ids))
+        file_offsets.append(len(line_offsets) - 1)
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(os.path.join(corpus_dir, "vocab.txt"), "w") as vocab_file:
+        vocab_file.writelines(w + "\n" for w in vocab)
+    for name, values, dtype in [
+        ("ids.npy", ids, np.uint32),
+        ("line_offsets.npy", line_offsets, np.int64),
+        ("file_offsets.npy", file_offsets, np.int64),
+    ]:
+        np.save(os.path.join(corpus_dir, name), np.frombuffer(values, dtype))
+
+    # written last, as corpus is used only if its meta matches source files
+    meta = {
+        "source_root_dir": source_root_dir,
+        "no_of_words": len(ids),
+        "no_of_lines": len(line_offsets) - 1,
+        "vocab_size": len(vocab),
+        "files": get_files_meta(source_root_dir, file_paths),
+    }
+    with open(os.path.join(corpus_dir, "meta.json"), "w") as meta_file:
+        json.dump(meta, meta_file, indent=2, ensure_ascii=False)
+
+
+class TokenizedCorpus:
+    """
+    Reads a corpus built by `build_corpus`. Word id arrays are memory mapped,
+    and words are looked up only when needed.
+    """
+
+    def __init__(self, corpus_dir: str):
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        self.source_root_dir: str = self.meta["source_root_dir"]
+        self.file_paths: "list[str]" = [f["path"] for f in self.meta["files"]]
+        self.file_indices = {path: i for i, path in enumerate(self.file_paths)}
+
+        with open(os.path.join(corpus_dir, "vocab.txt")) as vocab_file:
+            words = vocab_file.read().split("\n")[:-1]
+        self.vocab = np.array(words, dtype=object)
+        self.word_lens = np.array([len(w) for w in words], dtype=np.int64)
+
+        def load(name):
+            return np.load(os.path.join(corpus_dir, name), mmap_mode="r")
+
+        self.ids: np.ndarray = load("ids.npy")
+        self.line_offsets: np.ndarray = load("line_offsets.npy")
+        self.file_offsets: np.ndarray = load("file_offsets.npy")
+
+    def is_up_to_date(self):
+        """Returns True if source files are the same as when corpus was built."""
+        return is_up_to_date(self.source_root_dir, self.corpus_dir)
+
+    def get_file_index(self, file_path: str):
+        """Returns index of file given by its path in source root dir."""
+        return self.file_indices[os.path.relpath(file_path, self.source_root_dir)]
+
+    def get_sub_dir_file_indices(self, sub_dir: str):
+        """Returns indices of files in given dir (relative to source root dir)."""
+        prefix = os.path.normpath(sub_dir) + os.sep
+
+        return [i for i, path in enumerate(self.file_paths) if path.startswith(prefix)]
+
+    def get_file_ids(self, file_index: int):
+        """Returns (memory mapped) word ids of file."""
+        first_line, end_line = self.file_offsets[file_index : file_index + 2]
+
+        return self.ids[self.line_offsets[first_line] : self.line_offsets[end_line]]
+
+    def get_ids(self, file_indices: "list[int]"):
+        """Returns word ids of all files, concatenated in memory."""
+        if not file_indices:
+            return np.empty(0, dtype=np.uint32)
+
+        return np.concatenate([self.get_file_ids(i) for i in file_indices])
+
+    def iter_words(self, ids: np.ndarray, batch_size: int = 65536):
+        """Yields words of word ids, looking up a batch at a time."""
+        for i in range(0, len(ids), batch_size):
+            yield from self.vocab[ids[i : i + batch_size]].tolist()
+
+    def iter_lines(self, file_index: int):
+        """Yields list of words in each line of file."""
+        first_line, end_line = self.file_offsets[file_index : file_index + 2]
+        offsets = self.line_offsets[first_line : end_line + 1]
+        words = self.vocab[self.ids[offsets[0] : offsets[-1]]].tolist()
+        offsets = (offsets - offsets[0]).tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield words[start:end]
+
+    def get_lines(self, file_index: int):
+        """Returns lines of file (words of line joined by a space)."""
+        return [" ".join(words) for words in self.iter_lines(file_index)]
+
+
+if __name__ == "__main__":
+    build_corpus(source_root_dir, corpus_dir)
+
+    corpus = TokenizedCorpus(corpus_dir)
+    print(
+        f"Tokenised {len(corpus.file_paths)} files: {corpus.meta['no_of_lines']} "
+        f"lines, {corpus.meta['no_of_words']} words, {len(corpus.vocab)} in vocab"
+    )
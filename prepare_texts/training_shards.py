@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Writes training text as size-balanced shards, with a JSON index of line counts
+and char histograms of each shard, used by `combine-all-txts.py`.
+
+Lines (of shuffled words) are written to the shard with the fewest chars so
+far, so independent renderers can each claim a shard (see
+`split_training_text.py`) without reading or shuffling the whole text.
+"""
+
+import heapq
+import json
+import os
+from collections import Counter
+
+
+def get_shard_path(output_file_path: str, shard_no: int):
+    """Returns path of shard file of training text."""
+    return f"{output_file_path}.shard-{shard_no}"
+
+
+def get_index_path(output_file_path: str):
+    """Returns path of JSON index of shards of training text."""
+    return f"{output_file_path}.shards.json"
+
+
+class ShardWriter:
+    """
+    Writes lines to `no_of_shards` shards of training text, each line to the
+    shard with the fewest chars so far. Index is written when closed.
+    """
+
+    def __init__(self, output_file_path: str, no_of_shards: int):
+        self.output_file_path = output_file_path
+        self.no_of_shards = no_of_shards
+        self.shard_files = [
+            open(get_shard_path(output_file_path, i), "w") for i in range(no_of_shards)
+        ]
+        self.line_counts = [0] * no_of_shards
+        self.char_counts = [Counter() for _ in range(no_of_shards)]
+        # (no. of chars, shard no.) of each shard, smallest first
+        self.sizes = [(0, i) for i in range(no_of_shards)]
+
+    def write_lines(self, lines: "list[str]"):
+        """Writes lines (without newlines) to shards."""
+        sizes = self.sizes
+        shard_lines: "list[list[str]]" = [[] for _ in range(self.no_of_shards)]
+        for line in lines:
+            size, i = sizes[0]
+            heapq.heapreplace(sizes, (size + len(line) + 1, i))
+            shard_lines[i].append(line)
+
+        for i, lines_of_shard in enumerate(shard_lines):
+            if not lines_of_shard:
+                continue
+            text = "\n".join(lines_of_shard) + "\n"
+            self.shard_files[i].write(text)
+            self.line_counts[i] += len(lines_of_shard)
+            self.char_counts[i].update(text)
+
+    def get_index(self):
+        """Returns index of line counts & char histograms of shards."""
+        return {
+            "training_text": os.path.basename(self.output_file_path),
+            "no_of_shards": self.no_of_shards,
+            "shards": [
+                {
+                    "file": os.path.basename(get_shard_path(self.output_file_path, i)),
+                    "lines": self.line_counts[i],
+                    "chars": sum(self.char_counts[i].values()),
+                    "char_counts": dict(self.char_counts[i].most_common()),
+                }
+                for i in range(self.no_of_shards)
+            ],
+        }
+
+    def close(self):
+        """Closes shard files, and writes & returns index."""
+        for shard_file in self.shard_files:
+            shard_file.close()
+
+        index = self.get_index()
+        with open(get_index_path(self.output_file_path), "w") as index_file:
+            json.dump(index, index_file, ensure_ascii=False, indent=2)
+
+        return index
+
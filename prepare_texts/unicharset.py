@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Loads tesseract unicharset files, and checks coverage of a training text (or
+tokenized corpus) by a unicharset before rendering it.
+
+A unicharset file has the no. of unichars in its first line, then a line for
+each unichar: `unichar properties [metrics] script other_case ...` (`NULL` is
+the space). Unichars are indexed by code point, so freq of each unichar is
+found from a bincount of code points of text (see byte_stats.py).
+
+Run as a script to print unichars with fewer than `MIN_SAMPLES` samples and
+chars of text missing in unicharset (exits with 1 if any), and to diff
+unicharset with another one.
+"""
+
+import numpy as np
+
+from byte_stats import get_byte_stats, whitespace_code_points
+from tokenized_corpus import TokenizedCorpus
+
+# unicharset to check training text with, and unicharset to diff it with
+# (`None` to not diff)
+unicharsets_dir = "../generate_ground_truth/unicharset_files"
+unicharset_file = f"{unicharsets_dir}/amh.unicharset-by-tesstrain"
+diff_unicharset_file = f"{unicharsets_dir}/amh.unicharset"
+
+# training text to check, or tokenized corpus (used if not `None`)
+training_text_file = "./amh-layer.training_txt"
+tokenized_corpus_dir = None
+
+# min no. of samples of each unichar in training text
+MIN_SAMPLES = 20
+
+# unichars of special meaning to tesseract (not chars of text)
+special_unichars = {"Joined", "|Broken|0|1"}
+
+
+class Unicharset:
+    """
+    Unichars of a unicharset file (in order of their ids), with their
+    properties & scripts, indexed by code point.
+    """
+
+    def __init__(
+        self, unichars: "list[str]", props: "list[int]", scripts: "list[str]"
+    ):
+        self.unichars = unichars
+        self.props = np.array(props, dtype=np.uint8)
+        self.scripts = np.array(scripts, dtype=object)
+
+        # id of unichar of each code point (-1 if none), for single chars
+        self.ids = {u: i for i, u in enumerate(unichars)}
+        single = [(ord(u), i) for i, u in enumerate(unichars) if len(u) == 1]
+        self.code_points = np.array([c for c, _ in single], dtype=np.int64)
+        self.code_point_ids = np.full(
+            self.code_points.max(initial=0) + 1, -1, dtype=np.int64
+        )
+        self.code_point_ids[self.code_points] = [i for _, i in single]
+
+    @classmethod
+    def load(cls, file_path: str):
+        """Returns unicharset parsed from unicharset file."""
+        with open(file_path, encoding="utf-8") as f:
+            no_of_unichars = int(f.readline())
+            lines = f.read().split("\n")[:no_of_unichars]
+
+        unichars: "list[str]" = []
+        props: "list[int]" = []
+        scripts: "list[str]" = []
+        for line in lines:
+            fields = line.split(" ")
+            unichar = " " if fields[0] == "NULL" else fields[0]
+            # script follows metrics (comma separated) if given
+            script = fields[3] if "," in fields[2] else fields[2]
+
+            unichars.append(unichar)
+            props.append(int(fields[1], 16))
+            scripts.append(script)
+
+        return cls(unichars, props, scripts)
+
+    def __len__(self):
+        return len(self.unichars)
+
+    def __contains__(self, unichar: str):
+        return unichar in self.ids
+
+    def get_counts(self, code_point_counts: np.ndarray):
+        """
+        Returns no. of samples of each unichar in text (of single char
+        unichars, others are zero), given bincount of code points of text.
+        """
+        counts = np.zeros(len(self.unichars), dtype=np.int64)
+        in_text = self.code_points < len(code_point_counts)
+        ids = self.code_point_ids[self.code_points[in_text]]
+        counts[ids] = code_point_counts[self.code_points[in_text]]
+
+        return counts
+
+    def get_missing(self, code_point_counts: np.ndarray):
+        """Returns `{char: count}` of chars of text (not spaces) not in unicharset."""
+        code_points = np.flatnonzero(code_point_counts)
+        known = code_points < len(self.code_point_ids)
+        has_unichar = np.zeros(len(code_points), dtype=bool)
+        has_unichar[known] = self.code_point_ids[code_points[known]] >= 0
+        is_missing = ~has_unichar & ~np.isin(code_points, whitespace_code_points)
+
+        return {
+            chr(c): int(code_point_counts[c]) for c in code_points[is_missing].tolist()
+        }
+
+    def get_low_samples(self, code_point_counts: np.ndarray, min_samples: int):
+        """Returns `{unichar: count}` of unichars with fewer samples than min."""
+        counts = self.get_counts(code_point_counts)
+        ids = np.flatnonzero(counts < min_samples).tolist()
+
+        return {
+            self.unichars[i]: int(counts[i])
+            for i in ids
+            if self.unichars[i] != " " and self.unichars[i] not in special_unichars
+        }
+
+    def diff(self, other: "Unicharset"):
+        """Returns lists of unichars only in this & only in other unicharset."""
+        return (
+            [u for u in self.unichars if u not in other],
+            [u for u in other.unichars if u not in self],
+        )
+
+
+def get_corpus_code_point_counts(corpus: TokenizedCorpus):
+    """Returns bincount of code points of all words of tokenized corpus."""
+    # chars of each word, times no. of occurrences of word
+    id_counts = np.bincount(corpus.ids, minlength=len(corpus.vocab))
+    word_ids = np.flatnonzero(id_counts)
+    words = corpus.vocab[word_ids].tolist()
+    code_points = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+    weights = np.repeat(id_counts[word_ids], corpus.word_lens[word_ids])
+
+    return np.bincount(code_points, weights=weights).astype(np.int64)
+
+
+if __name__ == "__main__":
+    unicharset = Unicharset.load(unicharset_file)
+    print(f'Loaded {len(unicharset)} unichars from "{unicharset_file}"')
+
+    if diff_unicharset_file is not None:
+        other = Unicharset.load(diff_unicharset_file)
+        only_in_this, only_in_other = unicharset.diff(other)
+        for file_path, only_in in [
+            (unicharset_file, only_in_this),
+            (diff_unicharset_file, only_in_other),
+        ]:
+            print(f'\nOnly in "{file_path}" ({len(only_in)}): {" ".join(only_in)}')
+
+    if tokenized_corpus_dir is not None:
+        corpus = TokenizedCorpus(tokenized_corpus_dir)
+        code_point_counts = get_corpus_code_point_counts(corpus)
+        text_name = tokenized_corpus_dir
+    else:
+        code_point_counts = get_byte_stats(training_text_file)["code_point_counts"]
+        text_name = training_text_file
+
+    missing = unicharset.get_missing(code_point_counts)
+    low_samples = unicharset.get_low_samples(code_point_counts, MIN_SAMPLES)
+    print(f'\nChars of "{text_name}" not in unicharset ({len(missing)}): {missing}')
+    print(
+        f"Unichars with fewer than {MIN_SAMPLES} samples ({len(low_samples)}): "
+        f"{low_samples}"
+    )
+
+    if missing or low_samples:
+        exit(1)
@@ -3,7 +3,16 @@
 Utilities for preparing & cleaning txt files
 """
 
+import hashlib
+import io
+import os
 import re
+from collections import OrderedDict
+from functools import lru_cache, partial
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
 
 from constants import (
     allowed_non_eth_avoid,
@@ -20,6 +29,7 @@ from constants import (
     junk_enclosure_end_ptrns,
     junk_enclosure_start_ptrns,
     lines_to_skip,
+    non_frequent_eth_substitutes,
     same_enclosure_list,
     sentense_end_enclosures,
     strip_chars_ptrn,
@@ -29,6 +39,37 @@ from constants import (
 )
 
 
+def split_into_chunks(file_path: str, chunk_size: int):
+    """
+    Returns list of `(start, end)` byte offsets that split file into
+    chunks of about `chunk_size` bytes. Chunks always end after a newline
+    so that each chunk contains whole lines only.
+    """
+    file_size = os.path.getsize(file_path)
+    chunks: "list[tuple[int, int]]" = []
+    start = 0
+    with open(file_path, "rb") as file:
+        while start < file_size:
+            # move to approximate chunk end & extend to end of that line
+            file.seek(start + chunk_size)
+            file.readline()
+            end = min(file.tell(), file_size)
+            chunks.append((start, end))
+            start = end
+
+    return chunks
+
+
+def read_chunk_lines(file_path: str, start: int, end: int):
+    """Returns lines b/n `start` & `end` byte offsets of file (in text mode)."""
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        chunk = file.read(end - start)
+
+    # decode the same way `open` in text mode does (incl. newline handling)
+    return io.TextIOWrapper(io.BytesIO(chunk))
+
+
 def line_is_to_be_skipped(line: str):
     """
     Returns `True` if line is one of special case lines to be skipped.
@@ -39,24 +80,28 @@ def line_is_to_be_skipped(line: str):
     return line in lines_to_skip
 
 
+def load_lines_to_skip(file_path: str):
+    """
+    Returns set of lines to be skipped, containing `lines_to_skip` and
+    lines in given file (one per line), if the file exists.
+    """
+    lines = set(lines_to_skip)
+    if os.path.isfile(file_path):
+        with open(file_path) as skip_file:
+            lines.update(line.strip() for line in skip_file if not line.isspace())
+
+    return lines
+
+
 def replace_non_frequent_eth(match: re.Match):
     """
     Replaces non requent Ethiopic char with a substitute (frequent) char.
     """
-    replace_dict = {
-        "ጕ": "ጉ",
-        "ኵ": "ኩ",
-        "ዅ": "ኹ",
-        "ኍ": "ኁ",
-        "፧": "?",
-        "፠": " ",
-        "፨": " ",
-    }
     # get matched char & return substitute
     char = match.group()
-    assert len(char) == 1 and char in replace_dict
+    assert len(char) == 1 and char in non_frequent_eth_substitutes
 
-    return replace_dict[char]
+    return non_frequent_eth_substitutes[char]
 
 
 def remove_word_with_unwanted_chars(match: re.Match):
@@ -512,3 +557,297 @@ def convert_to_eth_num(n: int):
             + "፼"
             + convert_to_eth_num(rem)
         )
+
+
+@lru_cache(maxsize=None)
+def get_eth_num_table():
+    """Returns array of Ethiopic number strings of 0 to 9999 (index)."""
+    return np.array([convert_to_eth_num(n) for n in range(10000)])
+
+
+def convert_to_eth_nums(nums: "np.ndarray | list[int]"):
+    """
+    Converts array of [0-100000000) arabic no. integers into array of
+    Ethiopic number strings. Same as `convert_to_eth_num` for each number,
+    but looks up the ten thousands & the rest in a precomputed table.
+    """
+    nums = np.asarray(nums, dtype=np.int64)
+    if np.any((nums < 0) | (nums >= 100000000)):
+        raise ValueError("Numbers must be b/n 0 & 99,999,999 inclusive")
+
+    table = get_eth_num_table()
+    ten_thousands, rem = np.divmod(nums, 10000)
+
+    # at most 5 chars for each of ten thousands & the rest, and `፼` b/n
+    eth_nums = table[rem].astype("U11")
+    is_large = ten_thousands > 0
+    # no. of ten thousands isn't written if it is one
+    prefixes = np.where(ten_thousands[is_large] > 1, table[ten_thousands[is_large]], "")
+    eth_nums[is_large] = np.char.add(np.char.add(prefixes, "፼"), eth_nums[is_large])
+
+    return eth_nums
+
+
+class LineCache:
+    """
+    Bounded LRU cache of cleaned lines. Used to avoid cleaning lines
+    repeated excessively in some sources (adverts, footers, bylines, ...)
+    more than once.
+
+    Lines longer than `max_key_len` are keyed by a hash of their content,
+    to avoid storing huge keys.
+    """
+
+    def __init__(self, max_size: int = 50000, max_key_len: int = 128):
+        self.max_size = max_size
+        self.max_key_len = max_key_len
+        self.cache: "OrderedDict[str | bytes, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, line: str):
+        """Returns cache key of line."""
+        if len(line) <= self.max_key_len:
+            return line
+        return hashlib.blake2b(line.encode(), digest_size=16).digest()
+
+    def get(self, key: "str | bytes"):
+        """Returns cached line for key, or `None` if it's not cached."""
+        cleaned_line = self.cache.get(key)
+        if cleaned_line is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.cache.move_to_end(key)
+
+        return cleaned_line
+
+    def put(self, key: "str | bytes", cleaned_line: str):
+        """Caches cleaned line, removing the least recently used if full."""
+        self.cache[key] = cleaned_line
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+
+class LineCleaner:
+    """
+    Cleans lines of a single source file. Gives the same output as
+    `clean_non_frequent`, `clean_line` & `line_is_all_punc` used together,
+    but with patterns compiled once & source specific cases resolved once
+    per file instead of for each line.
+    """
+
+    # str.translate table to remove Ethiopic accent marks, replace minus, en &
+    # em dashes with `-` and substitute less frequent Ethiopic chars
+    non_frequent_table = str.maketrans(
+        {
+            **{chr(c): None for c in eth_unicode_range_marks},
+            **{dash: "-" for dash in "−–—"},
+            **non_frequent_eth_substitutes,
+        }
+    )
+    # chars kept as is after translation. A word with any char that is
+    # neither kept nor substituted is removed.
+    keep_chars = frozenset(allowed_non_eth_chars).union(
+        chr(c) for c in eth_unicode_range_all if c not in eth_avoid
+    )
+    # allowed non Ethiopic chars which can't be sole members of a word
+    avoid_chars = frozenset(allowed_non_eth_avoid)
+    avoid_only_word_ptrn = re.compile(
+        r"(?<!\S)["
+        + "".join(re.escape(c) for c in sorted(avoid_chars) if not c.isspace())
+        + r"]+(?!\S)"
+    )
+    word_ptrn = re.compile(r"\S+")
+    enh_corpus_ptrn = re.compile(r"[0-9]{3};")
+
+    to_replace_punc_ptrn = re.compile(r"(፡፡|፡፡|፡-|፤-)")
+    lack_space_ptrn = re.compile(r"([፣፦፥፧፡፤፠።፨;](?!\)|\])\S|\]\[|\)\()")
+    repeat_ptrn = re.compile(r"(.?([\._]{4,}|…{2,}).?)")
+    no_space_bfr_paren_ptrn = re.compile(r"[\u1200-\u135a]{2,}\([^\)]{3,}")
+    strip_ptrn = re.compile(
+        r"(^" + strip_chars_ptrn + r"{3,}.?|.?" + strip_chars_ptrn + r"{3,}$)"
+    )
+
+    # one pattern for each enclosure, applied in order (see remove_junk_in_enclosures)
+    junk_ptrns = [
+        re.compile(r"(.|\n)?" + start + junk_content_ptrn + end + r"(.|\n)?")
+        for start, end in zip(junk_enclosure_start_ptrns, junk_enclosure_end_ptrns)
+    ]
+    # all enclosures fused in one alternation. If it doesn't match, none
+    # of the per enclosure patterns can, and line is left as is.
+    any_junk_ptrn = re.compile(
+        "|".join(
+            start + junk_content_ptrn + end
+            for start, end in zip(junk_enclosure_start_ptrns, junk_enclosure_end_ptrns)
+        )
+    )
+
+    all_punc_chars = frozenset(allowed_non_eth_chars.union(eth_puncs))
+
+    def __init__(
+        self,
+        input_file_path: str = "",
+        instrument: bool = False,
+        line_cache: "LineCache | None" = None,
+        lines_to_skip: "set[str] | frozenset[str]" = frozenset(lines_to_skip),
+    ):
+        """
+        If `instrument` is set, time spent & no. of lines changed by each
+        cleaning stage are recorded in `stage_stats` (for uncached lines).
+
+        `line_cache` can be shared by cleaners of different files.
+
+        `lines_to_skip` are skipped if a line equals one of them, before
+        or after fixing spacing b/n words. (see `load_lines_to_skip`)
+        """
+        self.line_cache = line_cache
+        self.lines_to_skip = lines_to_skip
+
+        # pecuilar cases for some files in word lists & dicts
+        self.source_ptrns: "list[tuple[re.Pattern[str], str]]" = []
+        if "word_list" in input_file_path:
+            self.source_ptrns.append((re.compile(r"\*"), " "))
+        if "KBT-20071115.txt" in input_file_path:
+            self.source_ptrns.append((re.compile(r"[\[\]\(\)]"), " "))
+
+        # stages of `clean_line`, applied in order
+        self.line_stages: "list[tuple[str, Callable[[str], str]]]" = [
+            ("strip", lambda line: line.strip("+|, \t\n")),
+            (
+                "punc_substitution",
+                partial(self.to_replace_punc_ptrn.sub, substitue_correct_punctuations),
+            ),
+            ("lack_space", partial(self.lack_space_ptrn.sub, add_space_after_char)),
+            (
+                "repeat_pattern",
+                partial(self.repeat_ptrn.sub, remove_repetitive_punctuations),
+            ),
+            (
+                "no_space_bfr_paren",
+                partial(self.no_space_bfr_paren_ptrn.sub, add_space_bfr_paren),
+            ),
+            ("junk_enclosures", self.remove_junk_in_enclosures),
+            ("strip_pattern", partial(self.strip_ptrn.sub, clean_strt_and_end)),
+        ]
+
+        # {stage: {"time": seconds, "lines": no. of lines, "changed": no. of
+        # lines changed by stage}}, `None` if not instrumented
+        self.stage_stats: "dict[str, dict[str, float]] | None" = None
+        if instrument:
+            self.stage_stats = {
+                name: {"time": 0.0, "lines": 0, "changed": 0}
+                for name in ["non_frequent"] + [name for name, _ in self.line_stages]
+            }
+
+    def remove_word_with_unwanted_chars(self, match: "re.Match[str]"):
+        """Same as `remove_word_with_unwanted_chars`."""
+        word = match.group()
+
+        if self.avoid_chars.issuperset(word) or not self.keep_chars.issuperset(word):
+            return ""
+
+        # pecuilar to enh_corpus files
+        if ";" in word:
+            word = self.enh_corpus_ptrn.sub("", word)
+        return word
+
+    def clean_non_frequent(self, line: str):
+        """
+        Same as `clean_non_frequent`. Substitutes chars in one translate
+        pass, and only looks at each word if the line has a char to be
+        removed, or a word made of only `allowed_non_eth_avoid` chars.
+        """
+        line = line.translate(self.non_frequent_table)
+
+        if (
+            self.keep_chars.issuperset(line)
+            and ";" not in line
+            and self.avoid_only_word_ptrn.search(line) is None
+        ):
+            return line
+
+        return self.word_ptrn.sub(self.remove_word_with_unwanted_chars, line)
+
+    def remove_junk_in_enclosures(self, line: str):
+        """Same as `remove_junk_in_enclosures`."""
+        if line and not line[-1].isspace():
+            line += " "
+        # most lines have no junk, so check all enclosures at once first
+        if self.any_junk_ptrn.search(line) is None:
+            return line
+
+        for junk_ptrn in self.junk_ptrns:
+            line = junk_ptrn.sub(remove_junk_helper, line)
+
+        return line
+
+    def run_stage(self, name: str, stage: "Callable[[str], str]", line: str):
+        """Applies cleaning stage to line, recording its stats."""
+        start = perf_counter()
+        cleaned_line = stage(line)
+        stats = self.stage_stats[name]
+        stats["time"] += perf_counter() - start
+        stats["lines"] += 1
+        # ignore trailing space, added by junk stage & stripped by others
+        if cleaned_line.rstrip() != line.rstrip():
+            stats["changed"] += 1
+
+        return cleaned_line
+
+    def clean_line(self, line: str):
+        """Same as `clean_line`. Returns list of words in the cleaned line."""
+        if self.stage_stats is None:
+            for _, stage in self.line_stages:
+                line = stage(line)
+        else:
+            for name, stage in self.line_stages:
+                line = self.run_stage(name, stage, line)
+
+        if line in self.lines_to_skip:
+            return []
+
+        return line.split()
+
+    def line_is_all_punc(self, line: str):
+        """Same as `line_is_all_punc`."""
+        return self.all_punc_chars.issuperset(line)
+
+    def clean(self, line: str):
+        """
+        Cleans a line read from source file.
+
+        Returns: the cleaned line, or an empty string if line is to be
+        skipped (is empty or has no Ethiopic letter after cleaning).
+        """
+        # skip if line is space or empty
+        if line.isspace() or line == "":
+            return ""
+
+        for source_ptrn, repl in self.source_ptrns:
+            line = source_ptrn.sub(repl, line)
+
+        # cache is keyed after source specific cleaning, to be shared by files
+        if self.line_cache is not None:
+            key = self.line_cache.get_key(line)
+            final_line = self.line_cache.get(key)
+            if final_line is None:
+                final_line = self.clean_uncached(line)
+                self.line_cache.put(key, final_line)
+            return final_line
+
+        return self.clean_uncached(line)
+
+    def clean_uncached(self, line: str):
+        """Cleans line (after source specific cleaning) without using cache."""
+        if self.stage_stats is None:
+            line = self.clean_non_frequent(line)
+        else:
+            line = self.run_stage("non_frequent", self.clean_non_frequent, line)
+
+        final_line = " ".join(self.clean_line(line))
+
+        if self.line_is_all_punc(final_line) or final_line in self.lines_to_skip:
+            return ""
+
+        return final_line